@@ -0,0 +1,68 @@
+import re
+from typing import List
+
+WORD_PATTERN = re.compile(r"[A-Za-z']+")
+SENTENCE_PATTERN = re.compile(r"[^.!?]+[.!?]+")
+VOWEL_GROUP_PATTERN = re.compile(r"[aeiouy]+")
+
+# Flesch reading ease that suits children's books (higher is easier)
+TARGET_READING_EASE = 80.0
+
+# How much each heuristic counts towards the overall score
+WEIGHTS = {"length": 0.35, "names": 0.35, "readability": 0.2, "complete": 0.1}
+
+
+# Function to estimate the syllables in a word (good enough for ranking)
+def count_syllables(word: str) -> int:
+    word = word.lower()
+    syllables = len(VOWEL_GROUP_PATTERN.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and syllables > 1:
+        syllables -= 1
+    return max(1, syllables)
+
+
+# Function to compute the Flesch reading ease of a text
+def reading_ease(text: str) -> float:
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return 0.0
+    sentences = max(1, len(SENTENCE_PATTERN.findall(text)))
+    syllables = sum(count_syllables(word) for word in words)
+    return 206.835 - 1.015 * len(words) / sentences - 84.6 * syllables / len(words)
+
+
+class RankedBlurb:
+    def __init__(self, text: str, words: int, names_found: List[str], ease: float, score: float):
+        self.text = text
+        self.words = words
+        self.names_found = names_found
+        self.ease = ease
+        self.score = score
+
+
+# Function to score one candidate blurb with cheap local heuristics
+def score_blurb(text: str, names: List[str], max_words: int) -> RankedBlurb:
+    words = len(text.split())
+    # Full marks anywhere from half the budget up to the budget
+    if words > max_words:
+        length = max(0.0, 1 - (words - max_words) / max_words)
+    else:
+        length = min(1.0, words / (max_words / 2))
+    names_found = [name for name in names if re.search(rf"\b{re.escape(name)}\b", text, re.IGNORECASE)]
+    names_score = len(names_found) / len(names) if names else 1.0
+    ease = reading_ease(text)
+    readability = max(0.0, 1 - abs(ease - TARGET_READING_EASE) / TARGET_READING_EASE)
+    complete = 1.0 if text.rstrip().endswith((".", "!", "?")) else 0.0
+
+    score = (
+        WEIGHTS["length"] * length
+        + WEIGHTS["names"] * names_score
+        + WEIGHTS["readability"] * readability
+        + WEIGHTS["complete"] * complete
+    )
+    return RankedBlurb(text, words, names_found, ease, score)
+
+
+# Function to rank candidate blurbs, best first
+def rank_blurbs(texts: List[str], names: List[str], max_words: int) -> List[RankedBlurb]:
+    return sorted((score_blurb(text, names, max_words) for text in texts), key=lambda blurb: -blurb.score)
@@ -5,6 +5,16 @@ import logging
 from typing import List, Tuple
 import openai
 from openai import OpenAI
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repo's common/ package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.profiler import profile_reruns
+from common.warmup import start_warmup, openai_http_client
+from common.word_budget import WordBudget, enforce_word_budget, max_tokens_for
+from common.prompt_cache import PromptLayout
+from blurb_ranking import rank_blurbs
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +22,13 @@ logger = logging.getLogger(__name__)
 
 
 st.set_page_config(page_title="Children's Book Blurb Generator", page_icon="📚")
+
+# Opt-in rerun profiler (STREAMLIT_PROFILE=1 or ?profile=1)
+profile_reruns(__file__)
+
+# Worker warm-up (imports and provider connections); a no-op after the first rerun
+start_warmup(__file__)
+
 st.title("📚 Children's Book Blurb Generator")
 
 # Input: API key
@@ -32,6 +49,9 @@ setting = st.text_input("🌍 Setting (optional)")
 # Creativity control
 temperature = st.slider("🎨 Creativity (Temperature)", 0.0, 1.0, 0.8)
 
+# Several options come back from a single request
+num_options = st.slider("🗂️ Number of options", 1, 4, 1)
+
 # Parse character input
 def parse_characters(text: str) -> List[Tuple[str, int]]:
     lines = text.strip().split("\n")
@@ -45,41 +65,101 @@ def parse_characters(text: str) -> List[Tuple[str, int]]:
             return []
     return characters
 
-# Build prompt
-def build_prompt(characters, title, genre, setting):
+# Blurbs are asked to stay under this many words, and cut off client-side if they don't
+BLURB_WORD_LIMIT = 100
+
+# Fixed instructions, identical for every request (the cacheable prompt prefix)
+BLURB_INSTRUCTIONS = f"""
+ROLE: You are a marketing copywriter who is an expert at writing attractive blurbs for children's books.
+CONTEXT: I am a children's book author. I have come up with a list of characters and a title for a book, and I need help coming up with a blurb for the book that will excite children to read it.
+TASK: Generate a short blurb (<{BLURB_WORD_LIMIT} words) for the children's book based on the inputs that follow.
+Your blurb must be attractive and exciting. It must also be child-appropriate.
+"""
+
+# Build prompt messages: the fixed instructions first, then this book's inputs
+def build_prompt(characters, title, genre, setting) -> List[dict]:
     char_str = ", ".join([f"{name} ({age})" for name, age in characters])
     genre_str = genre if genre else "Use your best guess based on the title"
     setting_str = setting if setting else "Use your best guess based on the title and character names"
 
-    return f"""
-ROLE: You are a marketing copywriter who is an expert at writing attractive blurbs for children's books.
-CONTEXT: I am a children's book author. I have come up with a list of characters and a title for a book, and I need help coming up with a blurb for the book that will excite children to read it.
-TASK: Generate a short blurb (<100 words) for the children's book based on the following inputs:
+    return PromptLayout().stable(BLURB_INSTRUCTIONS).volatile(f"""
 * Characters: {char_str}
 * Title of book: {title}
 * Genre of book: {genre_str}
 * Setting of story: {setting_str}
-Your blurb must be attractive and exciting. It must also be child-appropriate.
-""".strip()
+""").messages()
+
+# Function to read the text deltas out of an OpenAI stream (closing it stops the upstream)
+def openai_text_chunks(stream):
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
 
 # Call OpenAI API (new SDK format)
-def get_blurb(prompt: str, api_key: str) -> str:
+def get_blurb(prompt: List[dict], api_key: str) -> str:
     try:
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, http_client=openai_http_client())
 
-        response = client.chat.completions.create(
+        # Stream the blurb and stop reading at the first sentence end past the budget
+        stream = client.chat.completions.create(
             model="gpt-4",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt,
             temperature=temperature,
+            max_tokens=max_tokens_for(BLURB_WORD_LIMIT),
+            stream=True,
         )
-        return response.choices[0].message.content.strip()
+        return "".join(enforce_word_budget(openai_text_chunks(stream), BLURB_WORD_LIMIT)).strip()
     except Exception as e:
         logger.error(f"OpenAI API call failed:\n{e}")
         st.error("❌ OpenAI API call failed. Check the logs or your API key.")
         return ""
 
+# Call OpenAI API once for several candidate blurbs (the `n` parameter)
+def get_blurb_candidates(prompt: List[dict], api_key: str, n: int) -> List[str]:
+    try:
+        client = OpenAI(api_key=api_key, http_client=openai_http_client())
+
+        stream = client.chat.completions.create(
+            model="gpt-4",
+            messages=prompt,
+            temperature=temperature,
+            max_tokens=max_tokens_for(BLURB_WORD_LIMIT),
+            n=n,
+            stream=True,
+        )
+        # Each candidate gets its own word budget; stop reading once all are spent
+        budgets = [WordBudget(BLURB_WORD_LIMIT) for _ in range(n)]
+        try:
+            for chunk in stream:
+                for choice in chunk.choices:
+                    if choice.delta.content:
+                        budgets[choice.index].feed(choice.delta.content)
+                if all(budget.stopped for budget in budgets):
+                    break
+        finally:
+            stream.close()
+        return [budget.text.strip() for budget in budgets if budget.text.strip()]
+    except Exception as e:
+        logger.error(f"OpenAI API call failed:\n{e}")
+        st.error("❌ OpenAI API call failed. Check the logs or your API key.")
+        return []
+
+# Show ranked candidates side by side
+def show_candidates(candidates: List[str], characters: List[Tuple[str, int]]):
+    ranked = rank_blurbs(candidates, [name for name, _ in characters], BLURB_WORD_LIMIT)
+    st.subheader("📝 Your Book Blurb Options:")
+    for rank, (column, blurb) in enumerate(zip(st.columns(len(ranked)), ranked), start=1):
+        with column:
+            st.markdown(f"**{'⭐ Best match' if rank == 1 else f'Option {rank}'}**")
+            (st.success if rank == 1 else st.info)(blurb.text)
+            st.caption(
+                f"Score {blurb.score:.2f} · {blurb.words} words · "
+                f"names {len(blurb.names_found)}/{len(characters)} · reading ease {blurb.ease:.0f}"
+            )
+
 # Run the app
 if st.button("✨ Generate Blurb"):
     if not all([api_key, char_input, book_title]):
@@ -88,7 +168,12 @@ if st.button("✨ Generate Blurb"):
         characters = parse_characters(char_input)
         if characters:
             prompt = build_prompt(characters, book_title, genre, setting)
-            blurb = get_blurb(prompt, api_key)
-            if blurb:
-                st.subheader("📝 Your Book Blurb:")
-                st.success(blurb)
+            if num_options > 1:
+                candidates = get_blurb_candidates(prompt, api_key, num_options)
+                if candidates:
+                    show_candidates(candidates, characters)
+            else:
+                blurb = get_blurb(prompt, api_key)
+                if blurb:
+                    st.subheader("📝 Your Book Blurb:")
+                    st.success(blurb)
@@ -2,6 +2,12 @@ import streamlit as st
 import openai
 from openai import OpenAI
 import sys
+from pathlib import Path
+
+# Shared helpers live in the repo's common/ package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.profiler import profile_reruns
+from common.warmup import start_warmup, openai_http_client
 
 # --- Version Check ---
 required_openai_version = "1.3.8"
@@ -35,7 +41,7 @@ You must clarify any assumptions before starting. Once clarified, respond using
 # -----------------------------
 def get_gpt_response(api_key, enhanced_prompt):
     try:
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, http_client=openai_http_client())
         response = client.chat.completions.create(
             model="gpt-4",
             messages=[
@@ -49,6 +55,12 @@ def get_gpt_response(api_key, enhanced_prompt):
     except Exception as e:
         return f"❌ Error: {str(e)}"
 
+# Opt-in rerun profiler (STREAMLIT_PROFILE=1 or ?profile=1)
+profile_reruns(__file__)
+
+# Worker warm-up (imports and provider connections); a no-op after the first rerun
+start_warmup(__file__)
+
 # -----------------------------
 # Streamlit UI
 # -----------------------------
@@ -1,9 +1,26 @@
 import streamlit as st
 import google.generativeai as genai
+from hedging import DEFAULT_PERCENTILE, HedgedGenerator
+from gemini_models import GeminiStream, available_models
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repo's common/ package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.profiler import profile_reruns
+from common.warmup import start_warmup
+from common.word_budget import enforce_word_budget, max_tokens_for
+from common.transcript import USER, ASSISTANT, Transcript
 
 # Page configuration
 st.set_page_config(page_title="Matrix Gemini Chat", layout="wide")
 
+# Opt-in rerun profiler (STREAMLIT_PROFILE=1 or ?profile=1)
+profile_reruns(__file__)
+
+# Worker warm-up (imports and provider connections); a no-op after the first rerun
+start_warmup(__file__)
+
 # Matrix-style CSS
 st.markdown("""
 <style>
@@ -65,33 +82,54 @@ st.title("Matrix Gemini Chat")
 
 # Initialize chat messages
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = Transcript(role_names=("user", "bot"))
 
 # Show chat messages
-for message in st.session_state.messages:
-    role = message["role"]
-    content = message["content"]
+for role, content in st.session_state.messages:
     with st.container():
         st.markdown(f"<div class='chat-message {role}'>{content}</div>", unsafe_allow_html=True)
 
-# Function to get available models
-def get_available_models():
+# Function to get available models (listed once per process, or already at warm-up)
+def get_available_models(api_key):
     try:
-        models = genai.list_models()
-        model_names = [model.name.split('/')[-1] for model in models if 'generateContent' in model.supported_generation_methods]
-        return model_names
+        return available_models(api_key)
     except Exception as e:
         st.error(f"Error listing models: {str(e)}")
         return ["gemini-1.0-pro", "gemini-1.5-pro", "gemini-pro"]  # Fallback options
 
+# Responses are asked to stay under this many words, and cut off client-side if they don't
+RESPONSE_WORD_LIMIT = 100
+
+# Function to wrap the user's message in the app's instructions
+def format_prompt(prompt):
+    return f"User query: {prompt}\n\nImportant: Your response must be strictly less than {RESPONSE_WORD_LIMIT} words."
+
 # Function to get response from Gemini
 def get_gemini_response(prompt, model_name):
     try:
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(
-            f"User query: {prompt}\n\nImportant: Your response must be strictly less than 100 words."
-        )
-        return response.text
+        return "".join(stream_gemini_response(model_name, prompt))
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+# Function to stream response chunks from Gemini, stopping once the word budget is spent
+def stream_gemini_response(model_name, prompt):
+    model = genai.GenerativeModel(model_name)
+    response = model.generate_content(
+        format_prompt(prompt),
+        stream=True,
+        generation_config={"max_output_tokens": max_tokens_for(RESPONSE_WORD_LIMIT)},
+    )
+    return GeminiStream(response, lambda chunks: enforce_word_budget(chunks, RESPONSE_WORD_LIMIT))
+
+# One hedger per process, so its latency history covers every session
+@st.cache_resource
+def load_hedger():
+    return HedgedGenerator(stream_gemini_response)
+
+# Function to get a response, sending it to a fallback model too if the primary is slow
+def get_hedged_response(prompt, model_name, fallback_model, pct):
+    try:
+        return load_hedger().generate(prompt, model_name, fallback_model, pct).text
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -111,7 +149,7 @@ try:
     genai.configure(api_key=api_key)
     
     # Get available models
-    model_options = get_available_models()
+    model_options = get_available_models(api_key)
     
     # Select model with a sidebar for admin/debugging
     with st.sidebar:
@@ -122,6 +160,22 @@ try:
             index=0
         )
         st.caption("If you're getting model errors, try selecting a different model from the list.")
+
+        # Hedging: race a fallback model when the primary is slower than usual
+        hedge_enabled = st.checkbox("Hedge slow responses", value=False)
+        fallback_options = [name for name in model_options if name != selected_model]
+        if hedge_enabled and fallback_options:
+            fallback_model = st.selectbox("Fallback model:", options=fallback_options, index=0)
+            hedge_percentile = st.slider("Hedge after this percentile of first-token latency", 50, 99, DEFAULT_PERCENTILE)
+            stats = load_hedger().stats()
+            if stats["requests"]:
+                st.caption(
+                    f"Hedge rate {stats['hedge_rate']:.0%} ({stats['hedge_wins']} won by fallback) · "
+                    f"latency saved ~{stats['saved_s']:.1f}s (est.) · "
+                    f"first token p50 {stats['p50_s']:.2f}s / p99 {stats['p99_s']:.2f}s"
+                )
+        else:
+            hedge_enabled = False
     
 except Exception as e:
     st.error(f"Error configuring API: {str(e)}")
@@ -135,14 +189,17 @@ with st.form(key="chat_form", clear_on_submit=True):
 # Process form submission
 if submit_button and user_input:
     # Add user message
-    st.session_state.messages.append({"role": "user", "content": user_input})
+    st.session_state.messages.append(USER, user_input)
     
     # Get bot response
     with st.spinner("Thinking..."):
-        bot_response = get_gemini_response(user_input, selected_model)
+        if hedge_enabled:
+            bot_response = get_hedged_response(user_input, selected_model, fallback_model, hedge_percentile)
+        else:
+            bot_response = get_gemini_response(user_input, selected_model)
     
     # Add bot response
-    st.session_state.messages.append({"role": "bot", "content": bot_response})
+    st.session_state.messages.append(ASSISTANT, bot_response)
     
     # Force a rerun to update the chat display
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import google.generativeai as genai
+
+# How long a model list stays fresh
+MODELS_TTL_S = 60 * 60
+
+_models: Dict[str, Tuple[float, List[str]]] = {}  # api key -> (fetched at, model names)
+_lock = threading.Lock()
+
+
+# Function to list the models that can generate content, cached per API key for the whole process
+def available_models(api_key: str) -> List[str]:
+    with _lock:
+        cached = _models.get(api_key)
+    if cached is not None and time.monotonic() - cached[0] < MODELS_TTL_S:
+        return cached[1]
+    genai.configure(api_key=api_key)
+    names = [model.name.split('/')[-1] for model in genai.list_models() if 'generateContent' in model.supported_generation_methods]
+    with _lock:
+        _models[api_key] = (time.monotonic(), names)
+    return names
+
+
+# Function to stop a streamed Gemini response (the SDK has no public close; its iterator
+# is the underlying gRPC/REST call, whose cancel() may be called from any thread)
+def cancel_stream(response):
+    cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+    if cancel is not None:
+        cancel()
+
+
+# Function to read the text out of a Gemini response stream, cancelling the stream if the reader stops early
+def stream_text(response) -> Iterator[str]:
+    try:
+        for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+    finally:
+        cancel_stream(response)
+
+
+class GeminiStream:
+    """
+    Text chunks of one streamed Gemini response, read through ``limit`` (for
+    example a word budget). ``cancel()`` stops the upstream call and may be
+    called from another thread while the chunks are being read.
+    """
+
+    def __init__(self, response, limit: Callable[[Iterator[str]], Iterator[str]] = iter):
+        self.response = response
+        self.chunks = limit(stream_text(response))
+
+    def __iter__(self) -> Iterator[str]:
+        return self.chunks
+
+    def cancel(self):
+        cancel_stream(self.response)
+
+
+# Function to configure the Gemini client and fetch the model list at worker warm-up
+def warm_models():
+    import streamlit as st
+
+    api_key = st.secrets["gemini"]["api_key"]
+    genai.configure(api_key=api_key)
+    available_models(api_key)
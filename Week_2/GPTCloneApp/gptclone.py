@@ -1,9 +1,25 @@
 import streamlit as st
 import google.generativeai as genai
+from gemini_models import stream_text
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repo's common/ package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.profiler import profile_reruns
+from common.warmup import start_warmup
+from common.word_budget import enforce_word_budget, max_tokens_for
+from common.transcript import USER, ASSISTANT, Transcript
 
 # Page configuration
 st.set_page_config(page_title="Matrix Gemini Chat", layout="wide")
 
+# Opt-in rerun profiler (STREAMLIT_PROFILE=1 or ?profile=1)
+profile_reruns(__file__)
+
+# Worker warm-up (imports and provider connections); a no-op after the first rerun
+start_warmup(__file__)
+
 # Function to add proper Matrix-style background
 def add_matrix_bg():
     """
@@ -82,14 +98,14 @@ st.markdown("<h1 style='text-align: center;'>Matrix Gemini Chat</h1>", unsafe_al
 
 # Initialize chat history
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = Transcript(role_names=("user", "bot"))
 
 # Display chat messages from history
-for message in st.session_state.messages:
+for role, content in st.session_state.messages:
     with st.container():
         st.markdown(f"""
-        <div class="chat-message {message['role']}">
-            <div class="message">{message['content']}</div>
+        <div class="chat-message {role}">
+            <div class="message">{content}</div>
         </div>
         """, unsafe_allow_html=True)
 
@@ -106,6 +122,9 @@ except Exception as e:
     """)
     st.stop()
 
+# Responses are asked to stay under this many words, and cut off client-side if they don't
+RESPONSE_WORD_LIMIT = 100
+
 # Function to get response from Gemini
 def get_gemini_response(user_input):
     try:
@@ -115,11 +134,16 @@ def get_gemini_response(user_input):
         prompt = f"""
         User query: {user_input}
         
-        Important: Your response must be strictly less than 100 words.
+        Important: Your response must be strictly less than {RESPONSE_WORD_LIMIT} words.
         """
         
-        response = model.generate_content(prompt)
-        return response.text
+        # Stream the response and stop reading (and cancel the stream) at the first sentence end past the budget
+        response = model.generate_content(
+            prompt,
+            stream=True,
+            generation_config={"max_output_tokens": max_tokens_for(RESPONSE_WORD_LIMIT)},
+        )
+        return "".join(enforce_word_budget(stream_text(response), RESPONSE_WORD_LIMIT))
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -128,14 +152,14 @@ def handle_input():
     user_message = st.session_state.user_message
     if user_message:
         # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": user_message})
+        st.session_state.messages.append(USER, user_message)
         
         # Get and display the response
         with st.spinner("Thinking..."):
             response = get_gemini_response(user_message)
             
         # Add assistant response to chat history
-        st.session_state.messages.append({"role": "bot", "content": response})
+        st.session_state.messages.append(ASSISTANT, response)
         
         # Clear input (using this method avoids the error)
         st.session_state.user_message = ""
@@ -0,0 +1,208 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+# A hedge fires once the primary is slower than this percentile of its
+# recent first-token latencies
+DEFAULT_PERCENTILE = 95
+MIN_SAMPLES = 10
+DEFAULT_DELAY_S = 2.0
+MIN_DELAY_S = 0.3
+HISTORY_SIZE = 200
+REQUEST_TIMEOUT_S = 120
+
+
+# Function to read a percentile from a list of numbers (nearest rank)
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# Function to estimate how much longer a model would have taken, given it had already taken waited_s
+# (the median of its past first-token latencies beyond that point; 0 if none went that long)
+def expected_extra_wait(history: Iterable[float], waited_s: float) -> float:
+    longer = [seconds for seconds in history if seconds > waited_s]
+    return percentile(longer, 50) - waited_s if longer else 0.0
+
+
+# Function to cancel a racer's stream, if it has been opened and can be cancelled
+def cancel_stream(stream):
+    cancel = getattr(stream, "cancel", None)
+    if cancel is not None:
+        cancel()
+
+
+class HedgeResult:
+    def __init__(self, text: str, model: str, hedged: bool, first_token_s: float):
+        self.text = text
+        self.model = model
+        self.hedged = hedged
+        self.first_token_s = first_token_s
+
+
+class Race:
+    """Shared state for one hedged request; the first model to stream a token wins."""
+
+    def __init__(self, primary: str):
+        self.primary = primary
+        self.started = time.perf_counter()
+        self.events: "queue.Queue" = queue.Queue()
+        self.cancelled: Dict[str, threading.Event] = {}
+        self.streams: Dict[str, Any] = {}  # model -> its open stream
+        self.winner: Optional[str] = None
+        self.winner_first_s = 0.0
+
+
+class HedgedGenerator:
+    """
+    Sends a prompt to a primary model and, if no first token has arrived
+    within a percentile-based delay, sends it to a fallback model too. The
+    first model to produce a token wins. ``stream(model, prompt)`` must return
+    the response text in chunks; if what it returns has a ``cancel()`` method,
+    the losing model's stream is cancelled as soon as the race is decided
+    (otherwise it is abandoned at its next chunk).
+
+    One instance is shared by every session so the latency history (and the
+    hedge delay derived from it) reflects all traffic in the process.
+    """
+
+    def __init__(self, stream: Callable[[str, str], Iterable[str]], default_delay_s: float = DEFAULT_DELAY_S,
+                 max_workers: int = 16):
+        self.stream = stream
+        self.default_delay_s = default_delay_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._first_token_history: Dict[str, Deque[float]] = {}
+        self._served_latencies: Deque[float] = deque(maxlen=HISTORY_SIZE)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.saved_s = 0.0
+
+    def _record_first_token(self, model: str, seconds: float):
+        with self._lock:
+            self._first_token_history.setdefault(model, deque(maxlen=HISTORY_SIZE)).append(seconds)
+
+    # Function to work out how long to wait on the primary before hedging
+    def hedge_delay(self, model: str, pct: float = DEFAULT_PERCENTILE) -> float:
+        with self._lock:
+            history = list(self._first_token_history.get(model, ()))
+        if len(history) < MIN_SAMPLES:
+            return self.default_delay_s
+        return max(MIN_DELAY_S, percentile(history, pct))
+
+    def _start(self, race: Race, model: str, prompt: str):
+        with self._lock:
+            if race.winner is not None:
+                return  # Already answered; no need to hedge
+            race.cancelled[model] = threading.Event()
+        self._executor.submit(self._attempt, race, model, prompt)
+
+    def _on_first_token(self, race: Race, model: str, elapsed_s: float):
+        losers = []
+        with self._lock:
+            if race.winner is None:
+                race.winner, race.winner_first_s = model, elapsed_s
+                for other, event in race.cancelled.items():
+                    if other != model:
+                        event.set()
+                        losers.append(race.streams.get(other))
+                if model != race.primary:
+                    # The primary is cancelled before its first token, so the saving is estimated from
+                    # its latency history, and the time it had taken so far is recorded as a lower bound
+                    # (leaving losses out would bias the hedge delay low)
+                    history = self._first_token_history.setdefault(race.primary, deque(maxlen=HISTORY_SIZE))
+                    self.saved_s += expected_extra_wait(history, elapsed_s)
+                    history.append(elapsed_s)
+        for stream in losers:
+            cancel_stream(stream)
+
+    def _attempt(self, race: Race, model: str, prompt: str):
+        # Runs in a worker thread; reports "first", then "done" or "error"
+        attempt_started = time.perf_counter()
+        chunks: List[str] = []
+        try:
+            stream = self.stream(model, prompt)
+            with self._lock:
+                race.streams[model] = stream
+            if race.cancelled[model].is_set():
+                cancel_stream(stream)  # Lost while the request was being sent
+                return
+            for chunk in stream:
+                if not chunks:
+                    if race.cancelled[model].is_set():
+                        return  # Lost before its first token (already recorded as a lower bound)
+                    self._record_first_token(model, time.perf_counter() - attempt_started)
+                    self._on_first_token(race, model, time.perf_counter() - race.started)
+                    race.events.put(("first", model, None))
+                if race.cancelled[model].is_set():
+                    return  # Lost the race: stop reading the stream
+                chunks.append(chunk)
+            if not chunks:
+                self._on_first_token(race, model, time.perf_counter() - race.started)
+            race.events.put(("done", model, "".join(chunks)))
+        except Exception as e:
+            if race.cancelled[model].is_set():
+                return  # The cancelled stream raising is expected
+            race.events.put(("error", model, e))
+
+    # Function to generate a response, hedging to the fallback if the primary is slow
+    def generate(self, prompt: str, primary: str, fallback: Optional[str],
+                 pct: float = DEFAULT_PERCENTILE) -> HedgeResult:
+        race = Race(primary)
+        self._start(race, primary, prompt)
+        can_hedge = fallback is not None and fallback != primary
+        hedge_at = race.started + self.hedge_delay(primary, pct)
+        deadline = race.started + REQUEST_TIMEOUT_S
+        failures: Dict[str, Exception] = {}
+
+        while True:
+            waiting_to_hedge = can_hedge and race.winner is None
+            wait_until = hedge_at if waiting_to_hedge else deadline
+            try:
+                kind, model, value = race.events.get(timeout=max(0.0, wait_until - time.perf_counter()))
+            except queue.Empty:
+                if waiting_to_hedge:
+                    self._start(race, fallback, prompt)
+                    can_hedge = False
+                    continue
+                raise TimeoutError(f"No response from {primary} within {REQUEST_TIMEOUT_S}s")
+
+            if kind == "done" and model == race.winner:
+                text = value
+                break
+            if kind == "error":
+                failures[model] = value
+                if model == race.winner:
+                    raise value
+                if can_hedge:
+                    # The primary failed before the hedge delay: go to the fallback now
+                    self._start(race, fallback, prompt)
+                    can_hedge = False
+                elif len(failures) == len(race.cancelled):
+                    raise value
+
+        with self._lock:
+            self.requests += 1
+            self.hedges += len(race.cancelled) > 1
+            self.hedge_wins += race.winner != primary
+            self._served_latencies.append(race.winner_first_s)
+        return HedgeResult(text, race.winner, len(race.cancelled) > 1, race.winner_first_s)
+
+    # Function to summarise hedging for the UI
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            served = list(self._served_latencies)
+            requests = self.requests
+            return {
+                "requests": requests,
+                "hedge_rate": self.hedges / requests if requests else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "saved_s": self.saved_s,
+                "p50_s": percentile(served, 50) if served else 0.0,
+                "p99_s": percentile(served, 99) if served else 0.0,
+            }
@@ -1,9 +1,17 @@
 import streamlit as st
-import requests
 from dotenv import load_dotenv # type: ignore
 import os
 from io import BytesIO
 from PIL import Image
+import asyncio
+from image_grid import generate_grid, build_zip
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repo's common/ package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.profiler import profile_reruns
+from common.warmup import start_warmup, http_session
 
 # Load environment variables
 load_dotenv()
@@ -17,34 +25,76 @@ model_options = {
 }
 
 st.set_page_config(page_title="Image Generator", layout="centered")
+
+# Opt-in rerun profiler (STREAMLIT_PROFILE=1 or ?profile=1)
+profile_reruns(__file__)
+
+# Worker warm-up (imports and provider connections); a no-op after the first rerun
+start_warmup(__file__)
+
 st.title("🖼️ HuggingFace Image Generator")
 
 # Prompt input
 prompt = st.text_input("Enter a prompt to generate an image:")
 
-# Model selection
-selected_model_label = st.selectbox("Choose a model:", list(model_options.keys()))
-selected_model = model_options[selected_model_label]
-
-# Generate button
-if st.button("Generate Image") and prompt:
-    with st.spinner("Generating image..."):
-        # Request to HuggingFace Inference API
-        headers = {"Authorization": f"Bearer {API_TOKEN}"}
-        payload = {"inputs": prompt}
-        response = requests.post(
-            f"https://api-inference.huggingface.co/models/{selected_model}",
-            headers=headers,
-            json=payload
-        )
-
-        if response.status_code == 200:
-            image = Image.open(BytesIO(response.content))
-            st.image(image, caption="Generated Image", use_container_width=True)
-
-            # Download button
-            img_buffer = BytesIO()
-            image.save(img_buffer, format="PNG")
-            st.download_button("Download Image", img_buffer.getvalue(), "generated_image.png", "image/png")
+# Single image or a grid comparing several models and seeds
+mode = st.radio("Mode:", ["Single image", "Compare models (grid)"], horizontal=True)
+
+if mode == "Single image":
+    # Model selection
+    selected_model_label = st.selectbox("Choose a model:", list(model_options.keys()))
+    selected_model = model_options[selected_model_label]
+
+    # Generate button
+    if st.button("Generate Image") and prompt:
+        with st.spinner("Generating image..."):
+            # Request to HuggingFace Inference API
+            headers = {"Authorization": f"Bearer {API_TOKEN}"}
+            payload = {"inputs": prompt}
+            response = http_session().post(
+                f"https://api-inference.huggingface.co/models/{selected_model}",
+                headers=headers,
+                json=payload
+            )
+
+            if response.status_code == 200:
+                image = Image.open(BytesIO(response.content))
+                st.image(image, caption="Generated Image", use_container_width=True)
+
+                # Download button
+                img_buffer = BytesIO()
+                image.save(img_buffer, format="PNG")
+                st.download_button("Download Image", img_buffer.getvalue(), "generated_image.png", "image/png")
+            else:
+                st.error("Failed to generate image. Please check the model and prompt.")
+else:
+    # Models and seeds to fan the prompt out over
+    selected_labels = st.multiselect("Choose models to compare:", list(model_options.keys()), default=list(model_options.keys()))
+    num_seeds = st.number_input("Images per model (different seeds):", min_value=1, max_value=4, value=1)
+    first_seed = st.number_input("First seed:", min_value=0, value=42)
+
+    if st.button("Generate Grid") and prompt and selected_labels:
+        models = {label: model_options[label] for label in selected_labels}
+        seeds = [int(first_seed) + i for i in range(int(num_seeds))]
+
+        # One row per model, one column per seed; tiles fill in as they arrive
+        placeholders = []
+        for label in models:
+            st.markdown(f"**{label}**")
+            for column in st.columns(len(seeds)):
+                placeholder = column.empty()
+                placeholder.info("Generating...")
+                placeholders.append(placeholder)
+
+        def show_tile(index, tile):
+            if tile.image_bytes is not None:
+                placeholders[index].image(tile.image_bytes, caption=f"Seed {tile.seed} ({tile.seconds:.1f}s)", use_container_width=True)
+            else:
+                placeholders[index].error(f"Seed {tile.seed} failed: {tile.error}")
+
+        tiles = asyncio.run(generate_grid(prompt, models, seeds, API_TOKEN, show_tile))
+
+        if any(tile.image_bytes is not None for tile in tiles):
+            st.download_button("Download All (ZIP)", build_zip(tiles), "generated_images.zip", "application/zip")
         else:
-            st.error("Failed to generate image. Please check the model and prompt.")
+            st.error("Failed to generate images. Please check the models and prompt.")
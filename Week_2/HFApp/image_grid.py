@@ -0,0 +1,83 @@
+import asyncio
+import io
+import re
+import time
+import zipfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from PIL import Image
+
+API_URL = "https://api-inference.huggingface.co/models/{model}"
+
+# Upper bound on simultaneous requests to the Inference API
+MAX_CONCURRENT_REQUESTS = 6
+REQUEST_TIMEOUT_S = 120
+
+
+class Tile:
+    def __init__(self, label: str, model: str, seed: int):
+        self.label = label
+        self.model = model
+        self.seed = seed
+        self.image_bytes: Optional[bytes] = None
+        self.error: Optional[str] = None
+        self.seconds = 0.0
+
+
+# Function to generate one tile (one model, one seed)
+async def generate_tile(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, prompt: str, tile: Tile) -> Tile:
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                API_URL.format(model=tile.model),
+                json={"inputs": prompt, "parameters": {"seed": tile.seed}},
+            )
+            if response.status_code == 200:
+                tile.image_bytes = response.content
+            else:
+                tile.error = f"Status {response.status_code}: {response.text[:200]}"
+        except httpx.HTTPError as e:
+            tile.error = str(e)
+        tile.seconds = time.perf_counter() - started
+    return tile
+
+
+# Function to fan one prompt out over every model/seed pair concurrently
+async def generate_grid(prompt: str, models: Dict[str, str], seeds: List[int], token: str,
+                        on_tile: Callable[[int, Tile], None],
+                        max_concurrency: int = MAX_CONCURRENT_REQUESTS) -> List[Tile]:
+    """
+    Calls ``on_tile(index, tile)`` as soon as each tile finishes, so the UI can
+    render tiles in arrival order. Total time is bounded by the slowest tile
+    rather than the sum of all of them.
+    """
+    tiles = [Tile(label, model, seed) for label, model in models.items() for seed in seeds]
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=REQUEST_TIMEOUT_S) as client:
+        async def run(index: int, tile: Tile) -> Tuple[int, Tile]:
+            return index, await generate_tile(client, semaphore, prompt, tile)
+
+        for finished in asyncio.as_completed([run(i, tile) for i, tile in enumerate(tiles)]):
+            index, tile = await finished
+            on_tile(index, tile)
+    return tiles
+
+
+# Function to bundle every generated image into a single ZIP
+def build_zip(tiles: List[Tile]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for tile in tiles:
+            if tile.image_bytes is None:
+                continue
+            name = re.sub(r"[^A-Za-z0-9]+", "_", tile.label).strip("_")
+            # Re-encode as PNG, like the single-image download
+            png_buffer = io.BytesIO()
+            Image.open(io.BytesIO(tile.image_bytes)).save(png_buffer, format="PNG")
+            archive.writestr(f"{name}_seed{tile.seed}.png", png_buffer.getvalue())
+    return buffer.getvalue()
@@ -6,8 +6,15 @@ from dotenv import load_dotenv # type: ignore
 import os
 import io
 from PIL import Image
-import requests
 import time
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repo's common/ package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.profiler import profile_reruns
+from common.warmup import start_warmup, http_session
+from common.word_budget import max_tokens_for, trim_to_last_sentence
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +28,13 @@ elif not HF_TOKEN.startswith("hf_"):
 
 # Streamlit page setup
 st.set_page_config(page_title="Children's Book Blurb Generator", page_icon="📚")
+
+# Opt-in rerun profiler (STREAMLIT_PROFILE=1 or ?profile=1)
+profile_reruns(__file__)
+
+# Worker warm-up (imports and provider connections); a no-op after the first rerun
+start_warmup(__file__)
+
 st.title("📚 Children's Book Blurb Generator")
 
 # Hugging Face model options
@@ -30,6 +44,9 @@ TEXT_MODELS = [
     "distilgpt2"
 ]
 
+# Text models small enough to run locally on the CPU
+LOCAL_TEXT_MODELS = ["google/flan-t5-base", "distilgpt2"]
+
 # Update the IMAGE_MODELS list to use more reliable models
 IMAGE_MODELS = [
     "CompVis/stable-diffusion-v1-4",    # Alternative stable model
@@ -37,10 +54,21 @@ IMAGE_MODELS = [
     "XLabs-AI/flux-RealismLora"
 ]
 
+# Image models that can run locally on the CPU with diffusers
+LOCAL_IMAGE_MODELS = ["CompVis/stable-diffusion-v1-4"]
+
 # Inputs
 selected_text_model = st.selectbox("🧠 Choose a text generation model", TEXT_MODELS)
 selected_image_model = st.selectbox("🎨 Choose an image generation model", IMAGE_MODELS)
 
+# Where to run the text model: Auto runs the small models locally
+text_backend = st.sidebar.selectbox("🖥️ Text backend", ["Auto", "Local (CPU)", "Remote (HF API)"])
+quantize_local = st.sidebar.checkbox("Quantize local models (int8)", value=True)
+
+# Where to run the image model: local previews are low-res and can be upscaled
+image_backend = st.sidebar.selectbox("🖼️ Image backend", ["Remote (HF API)", "Local (CPU)"])
+local_image_steps = st.sidebar.slider("Local denoising steps", min_value=4, max_value=30, value=12)
+
 char_input = st.text_area(
     "👧🧒 Enter characters as a list of (Name, Age) pairs — one per line, e.g.,\nAlice, 7\nBob, 10"
 )
@@ -49,6 +77,9 @@ book_title = st.text_input("📖 Book Title")
 genre = st.text_input("✨ Genre (optional)")
 setting = st.text_input("🌍 Setting (optional)")
 
+# Blurbs are asked to stay under this many words, and cut off client-side if they don't
+BLURB_WORD_LIMIT = 100
+
 # Parse character input
 def parse_characters(text: str) -> List[Tuple[str, int]]:
     lines = text.strip().split("\n")
@@ -71,7 +102,7 @@ def build_prompt(characters, title, genre, setting):
     return f"""
 ROLE: You are a marketing copywriter who is an expert at writing attractive blurbs for children's books.
 CONTEXT: I am a children's book author. I have come up with a list of characters and a title for a book, and I need help coming up with a blurb for the book that will excite children to read it.
-TASK: Generate a short blurb (<100 words) for the children's book based on the following inputs:
+TASK: Generate a short blurb (<{BLURB_WORD_LIMIT} words) for the children's book based on the following inputs:
 * Characters: {char_str}
 * Title of book: {title}
 * Genre of book: {genre_str}
@@ -79,6 +110,58 @@ TASK: Generate a short blurb (<100 words) for the children's book based on the f
 Your blurb must be attractive and exciting. It must also be child-appropriate.
 """.strip()
 
+# Clean up generated text into a blurb
+# (the word budget already ends it at a sentence boundary where it can)
+def clean_blurb(generated_text: str, prompt: str) -> str:
+    blurb = generated_text.replace(prompt, "").strip()
+    # End on the last complete sentence that fits the word budget
+    trimmed = trim_to_last_sentence(blurb, BLURB_WORD_LIMIT)
+    if trimmed is not None:
+        return trimmed
+    return blurb[:blurb.rfind('.')+1] if '.' in blurb else blurb
+
+# Load a local text model once per process; all sessions share its batcher
+@st.cache_resource
+def load_local_text_engine(model_id: str, quantize: bool):
+    from local_text import LocalTextEngine
+    return LocalTextEngine(model_id, quantize=quantize)
+
+# Generate text on the local CPU backend
+def get_local_blurb(prompt: str, model_id: str, quantize: bool) -> str:
+    try:
+        with st.spinner("🧠 Loading local model..."):
+            engine = load_local_text_engine(model_id, quantize)
+        if quantize:
+            # GPT-2 style Conv1D layers are converted to Linear first, so they are quantized too
+            st.caption(f"int8: {engine.quantized_layers} linear layers quantized" if engine.quantized_layers
+                       else "int8 quantization does not apply to this model; it runs in float32")
+        generated_text = engine.generate(
+            prompt,
+            max_new_tokens=max_tokens_for(BLURB_WORD_LIMIT),
+            min_new_tokens=50,
+            max_words=BLURB_WORD_LIMIT,
+            temperature=0.8,
+            top_p=0.9,
+            do_sample=True,
+        )
+        blurb = clean_blurb(generated_text, prompt)
+        if not blurb:
+            st.error("❌ The local model returned no text.")
+        return blurb
+    except Exception as e:
+        st.error(f"❌ Local text generation failed: {str(e)}")
+        return ""
+
+# Function to decide whether a model runs locally or on the Inference API
+def use_local_backend(model_id: str, backend: str) -> bool:
+    if backend == "Remote (HF API)":
+        return False
+    if model_id not in LOCAL_TEXT_MODELS:
+        if backend == "Local (CPU)":
+            st.info(f"{model_id} is too large to run locally; using the Inference API.")
+        return False
+    return True
+
 # Generate text using Hugging Face API
 def get_blurb(prompt: str, model_id: str, token: str) -> str:
     try:
@@ -89,7 +172,7 @@ def get_blurb(prompt: str, model_id: str, token: str) -> str:
         payload = {
             "inputs": prompt,
             "parameters": {
-                "max_length": 150,
+                "max_new_tokens": max_tokens_for(BLURB_WORD_LIMIT),
                 "min_length": 50,
                 "temperature": 0.8,
                 "top_p": 0.9,
@@ -102,7 +185,7 @@ def get_blurb(prompt: str, model_id: str, token: str) -> str:
         retry_delay = 5  # seconds
         
         for attempt in range(max_retries):
-            response = requests.post(api_url, headers=headers, json=payload)
+            response = http_session().post(api_url, headers=headers, json=payload)
             
             if response.status_code == 200:
                 result = response.json()
@@ -121,12 +204,7 @@ def get_blurb(prompt: str, model_id: str, token: str) -> str:
                     generated_text = result.get('generated_text', '')
                 
                 if generated_text:
-                    # Clean up the response
-                    blurb = generated_text.replace(prompt, "").strip()
-                    # Make sure it ends with a complete sentence
-                    if not any(blurb.endswith(end) for end in ['.', '!', '?']):
-                        blurb = blurb[:blurb.rfind('.')+1] if '.' in blurb else blurb
-                    return blurb
+                    return clean_blurb(generated_text, prompt)
                 else:
                     st.error(f"❌ No generated text in response: {result}")
                     return ""
@@ -147,11 +225,10 @@ def get_blurb(prompt: str, model_id: str, token: str) -> str:
         st.error(f"❌ Text generation failed: {str(e)}")
         return ""
 
-# Generate image using Hugging Face API
-def generate_image(blurb: str, title: str, genre: str, hf_token: str) -> Image.Image | None:
-    try:
-        genre_str = genre if genre else "the story"
-        prompt = f"""
+# Build prompt for image generation
+def build_image_prompt(blurb: str, title: str, genre: str) -> str:
+    genre_str = genre if genre else "the story"
+    return f"""
 ROLE: You are an expert illustrator of children's books.
 TASK:
 Generate a cover image for a children's book based on the blurb below. The image must be attractive and child-friendly. 
@@ -161,17 +238,27 @@ TITLE: {title}
 GENRE: {genre_str}
 BLURB: {blurb}
 """.strip()
+
+# Build a short prompt for local Stable Diffusion (its text encoder reads only 77 tokens)
+def build_local_image_prompt(blurb: str, title: str, genre: str) -> str:
+    genre_str = f"{genre}, " if genre else ""
+    return f"watercolor children's book cover illustration, child-friendly, {genre_str}{title}: {blurb}"
+
+# Generate image using Hugging Face API
+def generate_image(blurb: str, title: str, genre: str, hf_token: str) -> Image.Image | None:
+    try:
+        prompt = build_image_prompt(blurb, title, genre)
         
         url = f"https://api-inference.huggingface.co/models/{selected_image_model}"
         headers = {"Authorization": f"Bearer {hf_token}"}
-        response = requests.post(url, headers=headers, json={"inputs": prompt})
+        response = http_session().post(url, headers=headers, json={"inputs": prompt})
         
          # Add retry logic
         max_retries = 3
         retry_delay = 5  # seconds
         
         for attempt in range(max_retries):
-            response = requests.post(url, headers=headers, json={
+            response = http_session().post(url, headers=headers, json={
                 "inputs": prompt,
                 "parameters": {
                    # "negative_prompt": "text, words, letters, watermark",
@@ -204,32 +291,108 @@ BLURB: {blurb}
         st.error(f"❌ Failed to generate image: {e}")
         return None
 
+# Load the diffusers pipeline once per process; sessions queue for it
+@st.cache_resource
+def load_local_image_engine(model_id: str):
+    from local_image import LocalImageEngine
+    return LocalImageEngine(model_id)
+
+# Function to show queue position and per-step previews while a local image renders
+def local_progress_callbacks(placeholder, steps: int):
+    def on_wait(position: int):
+        placeholder.info(f"⏳ Waiting for the local image model: you are #{position} in line.")
+
+    def on_preview(step: int, preview: Image.Image):
+        placeholder.image(preview, caption=f"Step {step + 1}/{steps}", width=256)
+
+    return on_wait, on_preview
+
+# Generate a low-res image on the local CPU backend, streaming previews
+def generate_local_image(blurb: str, title: str, genre: str, model_id: str, steps: int) -> Image.Image | None:
+    try:
+        with st.spinner("🖼️ Loading local image model..."):
+            engine = load_local_image_engine(model_id)
+        placeholder = st.empty()
+        on_wait, on_preview = local_progress_callbacks(placeholder, steps)
+        image = engine.generate(build_local_image_prompt(blurb, title, genre), steps=steps,
+                                on_preview=on_preview, on_wait=on_wait)
+        placeholder.empty()
+        return image
+    except Exception as e:
+        st.error(f"❌ Local image generation failed: {str(e)}")
+        return None
+
+# Function to decide whether the cover is drawn locally or on the Inference API
+def use_local_image_backend(model_id: str, backend: str) -> bool:
+    if backend != "Local (CPU)":
+        return False
+    if model_id not in LOCAL_IMAGE_MODELS:
+        st.info(f"{model_id} can't run locally; using the Inference API.")
+        return False
+    return True
+
+# Show an image with its download button
+def show_cover(image: Image.Image, caption: str, file_name: str = "cover_image.png"):
+    st.image(image, caption=caption, use_container_width=True)
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    st.download_button(
+        label="💾 Download Cover Image",
+        data=buffered.getvalue(),
+        file_name=file_name,
+        mime="image/png"
+    )
+
 # Generate blurb and image
 if st.button("✨ Generate Blurb"):
+    st.session_state.pop("local_cover", None)
     if not all([char_input, book_title]):
         st.warning("Please fill in the characters and book title.")
     else:
         characters = parse_characters(char_input)
         if characters:
             prompt = build_prompt(characters, book_title, genre, setting)
-            blurb = get_blurb(prompt, selected_text_model, HF_TOKEN)
+            if use_local_backend(selected_text_model, text_backend):
+                blurb = get_local_blurb(prompt, selected_text_model, quantize_local)
+            else:
+                blurb = get_blurb(prompt, selected_text_model, HF_TOKEN)
             if blurb:
                 st.subheader("📝 Your Book Blurb:")
                 st.success(blurb)
 
                 # Image generation
-                with st.spinner("🖼️ Generating image..."):
-                    image = generate_image(blurb, book_title, genre, HF_TOKEN)
-
-                if image:
-                    st.image(image, caption="🎨 AI-Generated Cover Image", use_container_width=True)
-
-                    # Download button
-                    buffered = io.BytesIO()
-                    image.save(buffered, format="PNG")
-                    st.download_button(
-                        label="💾 Download Cover Image",
-                        data=buffered.getvalue(),
-                        file_name="cover_image.png",
-                        mime="image/png"
-                    )
+                if use_local_image_backend(selected_image_model, image_backend):
+                    image = generate_local_image(blurb, book_title, genre, selected_image_model, local_image_steps)
+                    if image:
+                        # Keep the preview so it can be upscaled on a later rerun
+                        st.session_state.local_cover = {
+                            "image": image,
+                            "prompt": build_local_image_prompt(blurb, book_title, genre),
+                            "model": selected_image_model,
+                        }
+                else:
+                    with st.spinner("🖼️ Generating image..."):
+                        image = generate_image(blurb, book_title, genre, HF_TOKEN)
+
+                    if image:
+                        show_cover(image, "🎨 AI-Generated Cover Image")
+
+# Local covers start as a fast low-res preview; upscale only when asked
+if "local_cover" in st.session_state:
+    cover = st.session_state.local_cover
+    upscaled = cover.get("upscaled")
+    if upscaled is not None:
+        show_cover(upscaled, "🎨 AI-Generated Cover Image (upscaled)")
+    else:
+        show_cover(cover["image"], "🎨 AI-Generated Cover Preview", file_name="cover_preview.png")
+        if st.button("🔍 Upscale Cover"):
+            engine = load_local_image_engine(cover["model"])
+            placeholder = st.empty()
+            on_wait, on_preview = local_progress_callbacks(placeholder, local_image_steps)
+            try:
+                cover["upscaled"] = engine.upscale(cover["image"], cover["prompt"], steps=local_image_steps,
+                                                   on_preview=on_preview, on_wait=on_wait)
+                st.rerun()
+            except Exception as e:
+                placeholder.empty()
+                st.error(f"❌ Upscaling failed: {str(e)}")
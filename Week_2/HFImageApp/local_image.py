@@ -0,0 +1,153 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Set
+
+import torch
+from PIL import Image
+from diffusers import AutoPipelineForImage2Image, AutoPipelineForText2Image, DPMSolverMultistepScheduler
+
+# CPU-friendly defaults: a fast multistep scheduler needs far fewer steps than 30
+DEFAULT_STEPS = 12
+PREVIEW_SIZE = 256
+FULL_SIZE = 512
+UPSCALE_STRENGTH = 0.35
+
+# Linear map from Stable Diffusion latents to approximate RGB, used for
+# cheap step-by-step previews without running the VAE decoder
+LATENT_RGB_FACTORS = torch.tensor([
+    [0.3512, 0.2297, 0.3227],
+    [0.3250, 0.4974, 0.2350],
+    [-0.2829, 0.1762, 0.2721],
+    [-0.2120, -0.2616, -0.7177],
+])
+
+
+# Function to turn intermediate latents into a small preview image
+def latents_to_preview(latents: torch.Tensor) -> Image.Image:
+    latent = latents[0].float().cpu()
+    if latent.shape[0] == LATENT_RGB_FACTORS.shape[0]:
+        rgb = torch.einsum("chw,cr->hwr", latent, LATENT_RGB_FACTORS)
+    else:
+        rgb = latent.mean(dim=0, keepdim=True).permute(1, 2, 0).expand(-1, -1, 3)
+    rgb = ((rgb + 1) / 2).clamp(0, 1).mul(255).byte().numpy()
+    return Image.fromarray(rgb)
+
+
+class GenerationQueue:
+    """
+    First-come, first-served queue so that only one CPU generation runs at a
+    time across all sessions, and each waiter can see its place in line.
+
+    A waiter that leaves the line early (Streamlit stops a script on rerun by
+    raising inside it) abandons its ticket, and the line skips over it.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned: Set[int] = set()
+
+    # Function to count the live tickets ahead of this one (call with the condition held)
+    def _position(self, ticket: int) -> int:
+        return ticket - self._serving - sum(1 for abandoned in self._abandoned if abandoned < ticket)
+
+    @contextmanager
+    def slot(self, on_wait: Optional[Callable[[int], None]] = None):
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+        try:
+            while True:
+                with self._condition:
+                    if ticket == self._serving:
+                        break
+                    position = self._position(ticket)
+                # on_wait updates the UI, so it runs without the lock (and may raise to stop the script)
+                if on_wait is not None:
+                    on_wait(position)
+                with self._condition:
+                    if ticket != self._serving:
+                        self._condition.wait(timeout=1.0)
+            yield
+        finally:
+            with self._condition:
+                if ticket == self._serving:
+                    self._serving += 1
+                    while self._serving in self._abandoned:
+                        self._abandoned.remove(self._serving)
+                        self._serving += 1
+                else:
+                    self._abandoned.add(ticket)
+                self._condition.notify_all()
+
+    # Function to report how many generations are running or waiting
+    def pending(self) -> int:
+        with self._condition:
+            return self._next_ticket - self._serving - len(self._abandoned)
+
+
+class LocalImageEngine:
+    """
+    Stable Diffusion on the CPU via ``diffusers``. The pipeline is built once
+    (callers cache the engine per process), switched to a fast scheduler with
+    attention slicing, and shared by all sessions through a generation queue.
+
+    A ready-made ``pipeline`` can be passed in (for example one built from a
+    tiny dummy UNet) so the engine runs offline.
+    """
+
+    def __init__(self, model_id: str, pipeline: Any = None, attention_slicing: bool = True):
+        self.model_id = model_id
+        self.pipe = pipeline or AutoPipelineForText2Image.from_pretrained(model_id, torch_dtype=torch.float32)
+        self.pipe.scheduler = DPMSolverMultistepScheduler.from_config(self.pipe.scheduler.config)
+        if attention_slicing:
+            self.pipe.enable_attention_slicing()
+        self.pipe.to("cpu")
+        self.pipe.set_progress_bar_config(disable=True)
+        self._img2img = None
+        self.queue = GenerationQueue()
+
+    def _step_callback(self, on_preview: Optional[Callable[[int, Image.Image], None]]):
+        def callback(pipe, step, timestep, callback_kwargs):
+            if on_preview is not None:
+                on_preview(step, latents_to_preview(callback_kwargs["latents"]))
+            return callback_kwargs
+        return callback
+
+    # Function to generate an image, streaming a latent preview after each step
+    def generate(self, prompt: str, size: int = PREVIEW_SIZE, steps: int = DEFAULT_STEPS, guidance_scale: float = 7.5,
+                 seed: int = 0, on_preview: Optional[Callable[[int, Image.Image], None]] = None,
+                 on_wait: Optional[Callable[[int], None]] = None) -> Image.Image:
+        with self.queue.slot(on_wait), torch.inference_mode():
+            return self.pipe(
+                prompt,
+                height=size,
+                width=size,
+                num_inference_steps=steps,
+                guidance_scale=guidance_scale,
+                generator=torch.Generator("cpu").manual_seed(seed),
+                callback_on_step_end=self._step_callback(on_preview),
+                callback_on_step_end_tensor_inputs=["latents"],
+            ).images[0]
+
+    # Function to upscale a preview on demand: resize, then refine with img2img
+    def upscale(self, image: Image.Image, prompt: str, size: int = FULL_SIZE, steps: int = DEFAULT_STEPS,
+                strength: float = UPSCALE_STRENGTH, guidance_scale: float = 7.5, seed: int = 0,
+                on_preview: Optional[Callable[[int, Image.Image], None]] = None,
+                on_wait: Optional[Callable[[int], None]] = None) -> Image.Image:
+        if self._img2img is None:
+            # Shares the already loaded weights with the text-to-image pipeline
+            self._img2img = AutoPipelineForImage2Image.from_pipe(self.pipe)
+            self._img2img.set_progress_bar_config(disable=True)
+        with self.queue.slot(on_wait), torch.inference_mode():
+            return self._img2img(
+                prompt,
+                image=image.resize((size, size), Image.LANCZOS),
+                strength=strength,
+                num_inference_steps=steps,
+                guidance_scale=guidance_scale,
+                generator=torch.Generator("cpu").manual_seed(seed),
+                callback_on_step_end=self._step_callback(on_preview),
+                callback_on_step_end_tensor_inputs=["latents"],
+            ).images[0]
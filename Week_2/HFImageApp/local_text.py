@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from transformers import (
+    AutoConfig,
+    AutoModelForCausalLM,
+    AutoModelForSeq2SeqLM,
+    AutoTokenizer,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+
+from transformers.pytorch_utils import Conv1D
+
+from common.word_budget import find_cut, trim_to_word_budget
+
+# Micro-batching: how many prompts go into one forward pass, and how long
+# the first request waits for others to join it
+MAX_BATCH_SIZE = 8
+MAX_WAIT_MS = 25
+
+
+class WordBudgetCriteria(StoppingCriteria):
+    """Stops each sequence in a batch once its text has used up the word budget."""
+
+    def __init__(self, tokenizer: Any, prompt_length: int, max_words: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.max_words = max_words
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        return torch.tensor([find_cut(text, self.max_words) is not None for text in texts], device=input_ids.device)
+
+
+# Function to swap GPT-2 style Conv1D layers for the equivalent nn.Linear, in place
+# (dynamic quantization only converts nn.Linear, so GPT-2 blocks would otherwise stay float)
+def conv1d_to_linear(model: torch.nn.Module) -> torch.nn.Module:
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()  # Conv1D computes x @ W + b
+                linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+    return model
+
+
+class LocalTextEngine:
+    """
+    Runs a Hugging Face text model on the CPU. Requests from every session are
+    queued and micro-batched into a single ``generate()`` call, so concurrent
+    users share one forward pass instead of taking turns.
+
+    ``model`` and ``tokenizer`` can be passed in directly (for example tiny
+    random-weight models built from a config) so the engine works offline.
+    """
+
+    def __init__(self, model_id: str, model: Any = None, tokenizer: Any = None, quantize: bool = False,
+                 onnx: bool = False, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.model_id = model_id
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.tokenizer = tokenizer or AutoTokenizer.from_pretrained(model_id)
+        self.model = model or self._load_model(model_id, onnx)
+        self.is_encoder_decoder = self.model.config.is_encoder_decoder
+
+        self.quantized_layers = 0
+        if quantize and not onnx:
+            # Dynamic int8 quantization of the Linear layers (CPU only)
+            self.model = torch.ao.quantization.quantize_dynamic(conv1d_to_linear(self.model), {torch.nn.Linear}, dtype=torch.qint8)
+            self.quantized_layers = sum(
+                isinstance(module, torch.ao.nn.quantized.dynamic.Linear) for module in self.model.modules()
+            )
+        if hasattr(self.model, "eval"):
+            self.model.eval()
+
+        # Decoder-only models need left padding and a pad token to batch
+        if not self.is_encoder_decoder:
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        self._requests: "queue.Queue[Tuple[str, Dict[str, Any], Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._batch_loop, name=f"local-text-{model_id}", daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def _load_model(model_id: str, onnx: bool):
+        is_encoder_decoder = AutoConfig.from_pretrained(model_id).is_encoder_decoder
+        if onnx:
+            # Optional ONNX Runtime backend (pip install optimum[onnxruntime])
+            from optimum.onnxruntime import ORTModelForCausalLM, ORTModelForSeq2SeqLM
+            model_class = ORTModelForSeq2SeqLM if is_encoder_decoder else ORTModelForCausalLM
+            return model_class.from_pretrained(model_id, export=True)
+        model_class = AutoModelForSeq2SeqLM if is_encoder_decoder else AutoModelForCausalLM
+        return model_class.from_pretrained(model_id)
+
+    # Function for sessions to call: blocks until this prompt's batch is done
+    def generate(self, prompt: str, timeout: Optional[float] = None, **generation_kwargs) -> str:
+        future: Future = Future()
+        self._requests.put((prompt, generation_kwargs, future))
+        return future.result(timeout=timeout)
+
+    def _batch_loop(self):
+        # Requests that didn't fit the last batch's settings go first next time
+        deferred: List[Tuple[str, Dict[str, Any], Future]] = []
+        while True:
+            first = deferred.pop(0) if deferred else self._requests.get()
+            batch = [first]
+
+            # Take deferred requests with the same settings, then wait briefly for more
+            for request in list(deferred):
+                if len(batch) < self.max_batch_size and request[1] == first[1]:
+                    deferred.remove(request)
+                    batch.append(request)
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                (batch if request[1] == first[1] else deferred).append(request)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[str, Dict[str, Any], Future]]):
+        prompts = [prompt for prompt, _, _ in batch]
+        try:
+            texts = self.generate_batch(prompts, **batch[0][1])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), text in zip(batch, texts):
+            future.set_result(text)
+
+    # Function to run one padded forward pass over a batch of prompts
+    # (``max_words`` stops each sequence early once it has used up that word budget)
+    def generate_batch(self, prompts: List[str], max_words: Optional[int] = None, **generation_kwargs) -> List[str]:
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True)
+        prompt_length = 0 if self.is_encoder_decoder else inputs["input_ids"].shape[1]
+        if max_words is not None:
+            generation_kwargs["stopping_criteria"] = StoppingCriteriaList(
+                [WordBudgetCriteria(self.tokenizer, prompt_length, max_words)]
+            )
+        with torch.inference_mode():
+            output = self.model.generate(**inputs, pad_token_id=self.tokenizer.pad_token_id, **generation_kwargs)
+        texts = self.tokenizer.batch_decode(output[:, prompt_length:], skip_special_tokens=True)  # Drop the echoed prompt
+        if max_words is not None:
+            texts = [trim_to_word_budget(text, max_words) for text in texts]
+        return texts
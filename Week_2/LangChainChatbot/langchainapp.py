@@ -1,15 +1,28 @@
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationChain
-from langchain.prompts import PromptTemplate
 import os
 import time
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repo's common/ package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.profiler import profile_reruns
+from common.warmup import start_warmup, openai_http_client
+from common.prompt_cache import PromptLayout, PromptCacheStats, langchain_cache_callback
+from common.transcript import USER, Transcript, langchain_history
+
+# The Gemini and OpenAI LangChain stacks are imported lazily inside the
+# functions below, so each is only loaded when it is actually used.
 
 # Set page configuration
 st.set_page_config(page_title="LangChain Chatbot", page_icon="🤖", layout="wide")
 
+# Opt-in rerun profiler (STREAMLIT_PROFILE=1 or ?profile=1)
+profile_reruns(__file__)
+
+# Worker warm-up (imports and provider connections); a no-op after the first rerun
+start_warmup(__file__)
+
 # Add some custom CSS
 st.markdown("""
 <style>
@@ -28,11 +41,49 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Function to create the conversation memory (a view of the session transcript, not a second copy)
+def new_conversation_memory(transcript):
+    from langchain.memory import ConversationBufferMemory
+    return ConversationBufferMemory(chat_memory=langchain_history(transcript), return_messages=True)
+
+# Heavy objects are built once per process and shared by every session
+@st.cache_resource
+def load_chat_prompt():
+    from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+    # Chat template for Gemini: fixed system text, then the append-only history, then the new
+    # message, so every turn's prompt starts with the previous turn's (and can be cached)
+    return ChatPromptTemplate.from_messages([
+        ("system", "You are a helpful, friendly AI assistant."),
+        MessagesPlaceholder(variable_name="history"),
+        ("human", "{input}"),
+    ])
+
+@st.cache_resource
+def load_gemini_llm(api_key):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model="gemini-1.5-pro",
+        google_api_key=api_key,
+        temperature=0.7,
+        convert_messages=True
+    )
+
+@st.cache_resource
+def load_openai_llm(api_key):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model_name="gpt-3.5-turbo",
+        openai_api_key=api_key,
+        temperature=0,
+        http_client=openai_http_client()
+    )
+
 # Initialize session state variables if they don't exist
 if "conversation_memory" not in st.session_state:
-    st.session_state.conversation_memory = ConversationBufferMemory(return_messages=True)
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.conversation_memory = None
+if "transcript" not in st.session_state:
+    st.session_state.transcript = Transcript(role_names=("user", "bot"))
 if "gemini_initialized" not in st.session_state:
     st.session_state.gemini_initialized = False
 if "chatbot" not in st.session_state:
@@ -45,6 +96,8 @@ if "last_message" not in st.session_state:
     st.session_state.last_message = ""
 if "processing_message" not in st.session_state:
     st.session_state.processing_message = False
+if "prompt_cache" not in st.session_state:
+    st.session_state.prompt_cache = PromptCacheStats()
 
 # App title and description
 st.title("🤖 LangChain Chatbot")
@@ -64,28 +117,16 @@ with col2:
 # Initialize Gemini chatbot when API key is provided
 if gemini_api_key and not st.session_state.gemini_initialized:
     try:
-        # LangChain template for Gemini
-        template = """You are a helpful, friendly AI assistant.
-        
-        Current conversation:
-        {history}
-        Human: {input}
-        AI Assistant:"""
-        
-        PROMPT = PromptTemplate(input_variables=["history", "input"], template=template)
-        
-        # Create the LangChain model
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-pro",
-            google_api_key=gemini_api_key,
-            temperature=0.7,
-            convert_messages=True
-        )
+        from langchain.chains import ConversationChain
+
+        # Memory is created here rather than at first paint
+        if st.session_state.conversation_memory is None:
+            st.session_state.conversation_memory = new_conversation_memory(st.session_state.transcript)
         
         st.session_state.chatbot = ConversationChain(
-            llm=llm,
+            llm=load_gemini_llm(gemini_api_key),
             memory=st.session_state.conversation_memory,
-            prompt=PROMPT,
+            prompt=load_chat_prompt(),
             verbose=True
         )
         
@@ -95,22 +136,17 @@ if gemini_api_key and not st.session_state.gemini_initialized:
         st.error(f"Error initializing Gemini: {e}")
 
 # Function to generate summary and sentiment analysis using OpenAI
-def generate_summary(chat_history, openai_key):
+def generate_summary(transcript, openai_key):
     try:
-        # Create OpenAI LLM instance
-        openai_llm = ChatOpenAI(
-            model_name="gpt-3.5-turbo",
-            openai_api_key=openai_key,
-            temperature=0
-        )
+        # Get the (cached) OpenAI LLM instance
+        openai_llm = load_openai_llm(openai_key)
         
         # Create prompt for summarization and sentiment analysis
-        chat_text = "\n".join([f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}" for msg in chat_history])
-        
-        summary_prompt = f"""
-        You are an expert at summarizing conversations and at sentiment analysis. Below is a conversation between a user and an AI assistant:
+        chat_text = "\n".join([f"{'User' if transcript.role(i) == USER else 'Assistant'}: {transcript.text(i)}" for i in range(len(transcript))])
         
-        {chat_text}
+        # Fixed instructions first and the conversation last, so the instructions form a cacheable prefix
+        summary_prompt = PromptLayout().stable("""
+        You are an expert at summarizing conversations and at sentiment analysis. You will be given a conversation between a user and an AI assistant.
         
         1. Please summarize this conversation in under 150 words.
         2. Perform a sentiment analysis of the conversation, describing the overall tone and emotions expressed.
@@ -122,7 +158,7 @@ def generate_summary(chat_history, openai_key):
         
         SENTIMENT ANALYSIS:
         [your sentiment analysis here]
-        """
+        """).history(chat_text, heading="Conversation").render()
         
         response = openai_llm.invoke(summary_prompt)
         return response.content
@@ -130,14 +166,18 @@ def generate_summary(chat_history, openai_key):
         return f"Error generating summary: {e}"
 
 # Display chat messages from history
-for message in st.session_state.chat_history:
+for role, text in st.session_state.transcript:
     with st.container():
         st.markdown(f"""
-        <div class="chat-message {message['role']}">
-            <div class="message">{message['content']}</div>
+        <div class="chat-message {role}">
+            <div class="message">{text}</div>
         </div>
         """, unsafe_allow_html=True)
 
+# Show how much of the chat prompts the provider served from its prompt cache
+if st.session_state.prompt_cache.requests:
+    st.caption(st.session_state.prompt_cache.describe())
+
 # Display the summary section if summary is displayed
 if st.session_state.summary_displayed:
     st.markdown("---")
@@ -169,19 +209,17 @@ if st.session_state.gemini_initialized and not st.session_state.summary_displaye
             # Set processing flag
             st.session_state.processing_message = True
             
-            # Add user message to chat history
-            st.session_state.chat_history.append({"role": "user", "content": user_input})
-            
             # Update last message tracking
             st.session_state.last_message = user_input
             st.session_state.last_message_time = current_time
             
             try:
-                # Get response from LangChain model
-                response = st.session_state.chatbot.predict(input=user_input)
-                
-                # Add bot response to chat history
-                st.session_state.chat_history.append({"role": "bot", "content": response})
+                # Get response from LangChain model (its memory adds the turn to the transcript)
+                # (the callback records how much of the prompt the provider had cached)
+                st.session_state.chatbot.predict(
+                    input=user_input,
+                    callbacks=[langchain_cache_callback(st.session_state.prompt_cache)],
+                )
             except Exception as e:
                 st.error(f"Error getting response: {e}")
             finally:
@@ -193,11 +231,11 @@ if st.session_state.gemini_initialized and not st.session_state.summary_displaye
     
     # End chat and generate summary
     if end_chat and openai_api_key:
-        if len(st.session_state.chat_history) == 0:
+        if len(st.session_state.transcript) == 0:
             st.warning("You haven't had any conversation yet!")
         else:
             with st.spinner("Generating conversation summary..."):
-                summary = generate_summary(st.session_state.chat_history, openai_api_key)
+                summary = generate_summary(st.session_state.transcript, openai_api_key)
                 st.session_state.summary = summary
                 st.session_state.summary_displayed = True
                 st.rerun()
@@ -208,8 +246,8 @@ if st.session_state.gemini_initialized and not st.session_state.summary_displaye
 if st.session_state.summary_displayed:
     if st.button("Start New Chat"):
         # Reset all session state
-        st.session_state.conversation_memory = ConversationBufferMemory(return_messages=True)
-        st.session_state.chat_history = []
+        # (the chain's memory reads this same transcript, so clearing it starts the chain afresh too)
+        st.session_state.transcript.clear()
         st.session_state.summary_displayed = False
         st.session_state.last_message = ""
         st.session_state.last_message_time = 0
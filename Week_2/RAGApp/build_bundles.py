@@ -0,0 +1,96 @@
+"""
+Build prebuilt FAISS index bundles for standard documents, offline.
+
+Each document is split and embedded exactly as an upload would be (same
+splitter, embedding model and document id), and saved in the library
+layout. Workers import the bundles at warm-up, so the first user to open
+one of these documents doesn't wait for it to be embedded.
+
+    OPENAI_API_KEY=... python build_bundles.py handbook.pdf policies/*.docx --out bundles
+    python build_bundles.py handbook.pdf --backend local --dtype int8
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from settings import (
+    CHUNK_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    EMBEDDING_MODEL,
+    EMBEDDING_DTYPES,
+    LOCAL_EMBEDDING_MODEL,
+    PAGE_BATCH_SIZE,
+    index_fingerprint,
+)
+from doc_library import DEFAULT_BUNDLE_DIR, DocumentLibrary, document_id, new_vectorstore
+from loaders import SUPPORTED_EXTENSIONS, iter_batches, load_pages
+
+
+# Function to split and embed one document, one batch of pages at a time
+def build_index(data: bytes, file_name: str, splitter, embeddings):
+    vectorstore = None
+    for batch in iter_batches(load_pages(data, file_name), PAGE_BATCH_SIZE):
+        chunks = splitter.split_documents(batch)
+        if not chunks:
+            continue
+        if vectorstore is None:
+            vectorstore = new_vectorstore(chunks, embeddings)
+        else:
+            vectorstore.add_documents(chunks)
+    return vectorstore
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", type=Path, help="documents to bundle (PDF, TXT, DOCX)")
+    parser.add_argument("--out", default=DEFAULT_BUNDLE_DIR, help="bundle directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=4, help="documents embedded in parallel")
+    parser.add_argument("--backend", choices=["openai", "local"], default="openai", help="embeddings to index with")
+    parser.add_argument("--dtype", choices=EMBEDDING_DTYPES, default="float32", help="vector precision (local backend)")
+    args = parser.parse_args()
+
+    from fast_splitter import FastTokenSplitter
+
+    splitter = FastTokenSplitter(chunk_size=CHUNK_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS)
+    if args.backend == "local":
+        from local_embeddings import LocalEmbeddings
+        embeddings = LocalEmbeddings(output_dtype=args.dtype)
+        fingerprint = index_fingerprint(LOCAL_EMBEDDING_MODEL, args.dtype)
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+        fingerprint = index_fingerprint()
+    bundles = DocumentLibrary(root_dir=args.out)
+
+    files = [path for path in args.files if path.suffix.lower().lstrip(".") in SUPPORTED_EXTENSIONS]
+    for skipped in sorted(set(args.files) - set(files)):
+        print(f"skipped {skipped} (unsupported format)", file=sys.stderr)
+
+    # Function to bundle one file, returning a line for the summary
+    def bundle(path: Path) -> str:
+        started = time.perf_counter()
+        data = path.read_bytes()
+        doc_id = document_id(data, fingerprint)
+        if bundles.is_built(doc_id):
+            return f"{doc_id}  {path.name}: already bundled"
+        vectorstore = bundles.get_or_build(doc_id, path.name, lambda: build_index(data, path.name, splitter, embeddings), fingerprint)
+        if vectorstore is None:
+            return f"{doc_id}  {path.name}: no text could be extracted"
+        return f"{doc_id}  {path.name}: {vectorstore.index.ntotal} chunks in {time.perf_counter() - started:.1f}s"
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for path, future in [(path, executor.submit(bundle, path)) for path in files]:
+            try:
+                print(future.result())
+            except Exception as e:
+                failed += 1
+                print(f"failed {path}: {e}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import tiktoken
+from langchain.schema import BaseRetriever, Document
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+from settings import (
+    DEFAULT_BASELINE_K,
+    DEFAULT_CANDIDATE_K,
+    DEFAULT_FETCH_K,
+    DEFAULT_RERANK_FETCH_K,
+    DEFAULT_TOKEN_BUDGET,
+    DUPLICATE_THRESHOLD,
+)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# Function to get the tokenizer used by the chat model
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str = "gpt-4o"):
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+# Function to count prompt tokens in a piece of text
+def count_tokens(text: str, model_name: str = "gpt-4o") -> int:
+    return len(get_encoding(model_name).encode(text, disallowed_special=()))
+
+
+# Function to compute how similar two chunks are by their word sets
+def word_overlap(text_a: str, text_b: str) -> float:
+    words_a = set(WORD_PATTERN.findall(text_a.lower()))
+    words_b = set(WORD_PATTERN.findall(text_b.lower()))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+# Function to get the (source, page, start, end) span of a chunk, if known
+def chunk_span(doc: Document) -> Optional[Tuple[Any, Any, int, int]]:
+    start = doc.metadata.get("start_index")
+    if start is None or start < 0:
+        return None
+    return (doc.metadata.get("source"), doc.metadata.get("page"), start, start + len(doc.page_content))
+
+
+# Function to merge two chunks that overlap or touch in the original text
+def merge_chunks(doc_a: Document, doc_b: Document) -> Optional[Document]:
+    span_a, span_b = chunk_span(doc_a), chunk_span(doc_b)
+    if span_a is None or span_b is None or span_a[:2] != span_b[:2]:
+        return None
+
+    # Make sure doc_a is the chunk that starts first
+    if span_b[2] < span_a[2]:
+        doc_a, doc_b = doc_b, doc_a
+        span_a, span_b = span_b, span_a
+
+    if span_b[2] > span_a[3]:
+        return None  # There is a gap between the chunks
+
+    if span_b[3] <= span_a[3]:
+        text = doc_a.page_content  # doc_b is fully inside doc_a
+    else:
+        text = doc_a.page_content + doc_b.page_content[span_a[3] - span_b[2]:]
+
+    return Document(page_content=text, metadata=dict(doc_a.metadata))
+
+
+# Function to pack ranked chunks into a token budget
+def pack_context(candidates: List[Document], token_budget: int, duplicate_threshold: float = DUPLICATE_THRESHOLD) -> List[Document]:
+    """
+    Walk the candidates in rank order, skipping near-duplicates, merging chunks
+    that are adjacent in the source document, and stopping at the token budget.
+    """
+    selected: List[Document] = []
+    selected_tokens: List[int] = []
+    used = 0
+
+    for doc in candidates:
+        if any(word_overlap(doc.page_content, kept.page_content) >= duplicate_threshold for kept in selected):
+            continue
+
+        # Prefer extending a neighbouring chunk over adding a new one
+        # (if the merged text would not fit, the chunk may still fit on its own)
+        merged_into = None
+        for i, kept in enumerate(selected):
+            merged = merge_chunks(kept, doc)
+            if merged is None:
+                continue
+            merged_tokens = count_tokens(merged.page_content)
+            if used - selected_tokens[i] + merged_tokens <= token_budget:
+                used += merged_tokens - selected_tokens[i]
+                selected[i], selected_tokens[i] = merged, merged_tokens
+                merged_into = i
+                break
+        if merged_into is not None:
+            continue
+
+        tokens = count_tokens(doc.page_content)
+        if used + tokens > token_budget:
+            continue  # A smaller chunk further down may still fit
+        selected.append(doc)
+        selected_tokens.append(tokens)
+        used += tokens
+
+    return selected
+
+
+# Function to run an MMR search that also returns the fetch_k pool it picked from, nearest first
+# (vector stores that are not a single FAISS index, like ShardedIndex, provide mmr_search_with_pool)
+def mmr_search_with_pool(vectorstore, query_vector: List[float], k: int, fetch_k: int, lambda_mult: float) -> Tuple[List[Document], List[Document]]:
+    if hasattr(vectorstore, "mmr_search_with_pool"):
+        return vectorstore.mmr_search_with_pool(query_vector, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)
+    index, docstore, index_to_docstore_id = vectorstore.index, vectorstore.docstore, vectorstore.index_to_docstore_id
+    query = np.array([query_vector], dtype=np.float32)
+    _, rows = index.search(query, fetch_k)
+    rows = [int(row) for row in rows[0] if row != -1]
+    if not rows:
+        return [], []
+    pool = [docstore.search(index_to_docstore_id[row]) for row in rows]
+    selected = maximal_marginal_relevance(query, [index.reconstruct(row) for row in rows], k=k, lambda_mult=lambda_mult)
+    return [pool[i] for i in selected], pool
+
+
+# Retriever that over-fetches from the vector store and packs the results
+class PackedRetriever(BaseRetriever):
+    vectorstore: Any
+    embeddings: Any
+    token_budget: int = DEFAULT_TOKEN_BUDGET
+    fetch_k: int = DEFAULT_FETCH_K
+    candidate_k: int = DEFAULT_CANDIDATE_K
+    lambda_mult: float = 0.6
+    baseline_k: int = DEFAULT_BASELINE_K
+    duplicate_threshold: float = DUPLICATE_THRESHOLD
+    reranker: Optional[Any] = None
+    rerank_budget_ms: Optional[float] = None  # None: the reranker's default budget
+    rerank_fetch_k: int = DEFAULT_RERANK_FETCH_K
+    last_stats: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        query_vector = self.embeddings.embed_query(query)
+
+        if self.reranker is not None:
+            # Over-fetch by vector similarity and let the reranker pick the best few
+            hits = self.vectorstore.similarity_search_with_score_by_vector(query_vector, k=self.rerank_fetch_k)
+            reranked, rerank_stats = self.reranker.rerank(query, hits, self.rerank_budget_ms)
+            candidates = reranked[:self.candidate_k]
+        else:
+            # MMR keeps the candidate set diverse before packing
+            candidates, pool = mmr_search_with_pool(
+                self.vectorstore, query_vector, k=self.candidate_k, fetch_k=self.fetch_k, lambda_mult=self.lambda_mult
+            )
+        packed = pack_context(candidates, self.token_budget, self.duplicate_threshold)
+
+        # Compare against plain top-k stuffing to report the savings
+        # (the nearest of the chunks already fetched, so no second search is needed)
+        if self.reranker is not None:
+            baseline = [doc for doc, _ in hits[:self.baseline_k]]
+        else:
+            baseline = pool[:self.baseline_k]
+        baseline_tokens = sum(count_tokens(doc.page_content) for doc in baseline)
+        packed_tokens = sum(count_tokens(doc.page_content) for doc in packed)
+        self.last_stats = {
+            "candidates": len(candidates),
+            "chunks": len(packed),
+            "packed_tokens": packed_tokens,
+            "baseline_tokens": baseline_tokens,
+            "tokens_saved": baseline_tokens - packed_tokens,
+        }
+        if self.reranker is not None:
+            self.last_stats["rerank_ms"] = rerank_stats["elapsed_ms"]
+        if hasattr(self.vectorstore, "route_stats"):
+            # Routed search over shards (the sharded index is shared, so read this call's stats now)
+            self.last_stats["route"] = self.vectorstore.route_stats()
+        return packed
@@ -0,0 +1,426 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import faiss
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from loaders import Buffer, as_memoryview
+
+# Where built indexes are kept (shared by the app's worker processes; private to the user they run as)
+DEFAULT_LIBRARY_DIR = os.getenv(
+    "RAG_LIBRARY_DIR", os.path.join(os.getenv("XDG_CACHE_HOME", os.path.join(Path.home(), ".cache")), "ragapp_library")
+)
+
+# Prebuilt index bundles (made offline with build_bundles.py) that are imported at warm-up
+DEFAULT_BUNDLE_DIR = os.getenv("RAG_BUNDLE_DIR", str(Path(__file__).resolve().parent / "bundles"))
+
+# How long an index may sit unused in RAM before it is evicted
+DEFAULT_IDLE_TTL_S = 30 * 60
+
+# Block size used to read an index file into the OS page cache
+PREFETCH_BLOCK_BYTES = 1 << 20
+
+# While a document is indexed, a new snapshot is published once the index has grown this much
+# since the last one (so the copying adds up to O(n)), or once this long has passed
+SNAPSHOT_GROWTH = 2.0
+SNAPSHOT_INTERVAL_S = 10.0
+
+
+# Function to derive a stable document id from the file contents and index settings
+def document_id(data: Buffer, fingerprint: str = "") -> str:
+    digest = hashlib.sha256()
+    with as_memoryview(data) as view:
+        digest.update(view)
+    digest.update(fingerprint.encode("utf-8"))
+    return digest.hexdigest()[:24]
+
+
+class VectorSearchOnly(Embeddings):
+    """
+    Placeholder embeddings for shared indexes. Sessions embed their queries
+    with their own API key and search by vector, so a shared index must never
+    embed text itself.
+    """
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise RuntimeError("Shared indexes are read-only; embed with the session's embeddings instead.")
+
+    def embed_query(self, text: str) -> List[float]:
+        raise RuntimeError("Shared indexes are searched by vector; embed the query with the session's embeddings.")
+
+
+# Function to refuse library files that another user owns or could have written
+def check_owned(path: Path):
+    if not hasattr(os, "getuid"):
+        return  # No POSIX ownership to check (Windows)
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} is not owned by this app or is writable by others; refusing to load it.")
+
+
+# Function to write an index in the library layout: FAISS vectors plus the chunks as JSON
+# (not LangChain's pickle, so loading a library file can never run code)
+def save_index(vectorstore: FAISS, path: Path):
+    faiss.write_index(vectorstore.index, str(path / "index.faiss"))
+    chunks = []
+    for row in range(vectorstore.index.ntotal):
+        chunk_id = vectorstore.index_to_docstore_id[row]
+        document = vectorstore.docstore.search(chunk_id)
+        chunks.append({"id": chunk_id, "page_content": document.page_content, "metadata": document.metadata})
+    (path / "docstore.json").write_text(json.dumps(chunks))
+
+
+# Function to load a saved index with the vectors memory-mapped from disk
+# (IO_FLAG_MMAP_IFC maps the vector storage in place; plain IO_FLAG_MMAP copies flat and
+# scalar-quantized vectors into private memory, so every worker would hold its own copy)
+def load_index_mmap(path: Path) -> FAISS:
+    for owned in (path, path / "index.faiss", path / "docstore.json"):
+        check_owned(owned)
+    index = faiss.read_index(str(path / "index.faiss"), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    chunks = json.loads((path / "docstore.json").read_text())
+    docstore = InMemoryDocstore({
+        chunk["id"]: Document(page_content=chunk["page_content"], metadata=chunk["metadata"]) for chunk in chunks
+    })
+    return FAISS(VectorSearchOnly(), index, docstore, {row: chunk["id"] for row, chunk in enumerate(chunks)})
+
+
+# Function to start an index from the first chunks, storing vectors at the embeddings' output precision
+def new_vectorstore(chunks: List[Document], embeddings: Embeddings) -> FAISS:
+    dtype = getattr(embeddings, "output_dtype", "float32")
+    if dtype == "float32":
+        return FAISS.from_documents(chunks, embeddings)
+    from local_embeddings import make_index
+
+    vectorstore = FAISS(embeddings, make_index(embeddings.dimension, dtype), InMemoryDocstore(), {})
+    vectorstore.add_documents(chunks)
+    return vectorstore
+
+
+# Function to take a read-only copy of an index that is still being built
+def snapshot_index(vectorstore: FAISS) -> FAISS:
+    return FAISS(
+        VectorSearchOnly(),
+        faiss.clone_index(vectorstore.index),
+        InMemoryDocstore(dict(vectorstore.docstore._dict)),
+        dict(vectorstore.index_to_docstore_id),
+    )
+
+
+class IngestJob:
+    """Progress of a document being indexed in the background."""
+
+    def __init__(self, doc_id: str, name: str, fingerprint: str = ""):
+        self.doc_id = doc_id
+        self.name = name
+        self.fingerprint = fingerprint
+        self.fraction = 0.0
+        self.chunks = 0
+        self.searchable_fraction = 0.0  # How much of the document the published snapshot covers
+        self.error: Optional[str] = None
+        self.started = time.monotonic()
+        self.first_batch_s: Optional[float] = None
+        self.first_batch = threading.Event()  # Set once there is something to search (or it failed)
+        self.finished = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return not self.finished.is_set()
+
+
+class LibraryEntry:
+    def __init__(self, doc_id: str, name: str, vectorstore: FAISS):
+        self.doc_id = doc_id
+        self.name = name
+        self.vectorstore = vectorstore
+        self.sessions: Dict[str, float] = {}  # session id -> last seen
+        self.last_used = time.monotonic()
+
+
+class DocumentLibrary:
+    """
+    Process-wide store of read-only FAISS indexes, keyed by document id.
+
+    Each document is embedded once, saved to the library directory and
+    loaded back memory-mapped, so worker processes on the same machine
+    share the vector pages through the OS cache. The directory is kept
+    private (0700) and indexes are only loaded from files the app owns.
+    Sessions hold a reference (by document id); indexes nobody has used for
+    ``idle_ttl_s`` are dropped from RAM and reloaded from disk on the next use.
+    """
+
+    def __init__(self, root_dir: str = DEFAULT_LIBRARY_DIR, idle_ttl_s: float = DEFAULT_IDLE_TTL_S):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        check_owned(self.root_dir)
+        self.root_dir.chmod(0o700)
+        self.idle_ttl_s = idle_ttl_s
+        self._entries: Dict[str, LibraryEntry] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._jobs: Dict[str, IngestJob] = {}
+
+    def _path(self, doc_id: str) -> Path:
+        return self.root_dir / doc_id
+
+    # Function to locate a derived file kept next to a document's index (e.g. routing centroids)
+    def artifact_path(self, doc_id: str, name: str) -> Path:
+        return self._path(doc_id) / name
+
+    def is_built(self, doc_id: str) -> bool:
+        path = self._path(doc_id)
+        return (path / "index.faiss").exists() and (path / "docstore.json").exists()
+
+    # Function to write a freshly built index to the library atomically
+    # (the fingerprint records the embedding settings, so sessions only open indexes they can query)
+    def _save(self, doc_id: str, name: str, vectorstore: FAISS, fingerprint: str = ""):
+        staging = Path(tempfile.mkdtemp(prefix=f".{doc_id}-", dir=self.root_dir))
+        save_index(vectorstore, staging)
+        meta = {"name": name, "chunks": vectorstore.index.ntotal}
+        if fingerprint:
+            meta["fingerprint"] = fingerprint
+        (staging / "meta.json").write_text(json.dumps(meta))
+        if self._path(doc_id).exists() and not self.is_built(doc_id):
+            shutil.rmtree(self._path(doc_id), ignore_errors=True)  # Saved in the old pickle layout: replace it
+        try:
+            os.replace(staging, self._path(doc_id))
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)  # Another worker saved it first
+
+    # Function to copy prebuilt bundles (saved indexes in the library layout) into the library
+    def import_bundles(self, bundle_dir: str) -> List[str]:
+        imported = []
+        for bundle in bundle_paths(bundle_dir):
+            if self.is_built(bundle.name):
+                continue
+            staging = Path(tempfile.mkdtemp(prefix=f".{bundle.name}-", dir=self.root_dir))
+            shutil.copytree(bundle, staging, dirs_exist_ok=True)
+            try:
+                os.replace(staging, self._path(bundle.name))
+                imported.append(bundle.name)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)  # Another worker imported it first
+        return imported
+
+    # Function to load indexes into RAM ahead of the first session that asks for them
+    def preload(self, doc_ids: List[str]):
+        for doc_id in doc_ids:
+            # Read the vectors once so the memory-mapped pages are already in the OS cache
+            with open(self._path(doc_id) / "index.faiss", "rb") as f:
+                while f.read(PREFETCH_BLOCK_BYTES):
+                    pass
+            self.get(doc_id)
+
+    def _load(self, doc_id: str) -> Optional[LibraryEntry]:
+        path = self._path(doc_id)
+        if not self.is_built(doc_id):
+            return None
+        meta = json.loads((path / "meta.json").read_text())
+        return LibraryEntry(doc_id, meta["name"], load_index_mmap(path))
+
+    def get(self, doc_id: str) -> Optional[FAISS]:
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                entry = self._load(doc_id)
+                if entry is None:
+                    return None
+                self._entries[doc_id] = entry
+            entry.last_used = time.monotonic()
+            return entry.vectorstore
+
+    def get_or_build(self, doc_id: str, name: str, build: Callable[[], Optional[FAISS]], fingerprint: str = "") -> Optional[FAISS]:
+        vectorstore = self.get(doc_id)
+        if vectorstore is not None:
+            return vectorstore
+
+        # Only one session embeds a given document; the others wait for it
+        with self._lock:
+            build_lock = self._build_locks.setdefault(doc_id, threading.Lock())
+        with build_lock:
+            if not self.is_built(doc_id):
+                built = build()
+                if built is None:
+                    return None
+                self._save(doc_id, name, built, fingerprint)
+                del built  # The in-RAM copy is replaced by the memory-mapped one
+        with self._lock:
+            self._build_locks.pop(doc_id, None)
+        return self.get(doc_id)
+
+    # Function to index a document in a background thread, publishing snapshots as it goes
+    def start_build(self, doc_id: str, name: str, steps: Callable[[], Iterator[Tuple[FAISS, float]]],
+                    fingerprint: str = "") -> Optional[IngestJob]:
+        """
+        ``steps()`` must yield ``(vectorstore, fraction_done)`` after each batch
+        it embeds. The first batch, and then any batch after which the index has
+        doubled (or ``SNAPSHOT_INTERVAL_S`` has passed), replaces the searchable
+        index with a snapshot, so sessions can query the document before it is
+        fully indexed. Returns None if the document is already built.
+        """
+        if self.is_built(doc_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(doc_id)
+            if job is not None and job.running:
+                return job  # Another session is already indexing it
+            job = self._jobs[doc_id] = IngestJob(doc_id, name, fingerprint)
+        threading.Thread(target=self._run_build, args=(job, steps), name=f"ingest-{doc_id}", daemon=True).start()
+        return job
+
+    def _publish(self, job: IngestJob, vectorstore: FAISS):
+        with self._lock:
+            entry = self._entries.get(job.doc_id)
+            if entry is None:
+                self._entries[job.doc_id] = LibraryEntry(job.doc_id, job.name, vectorstore)
+            else:
+                entry.vectorstore = vectorstore
+                entry.last_used = time.monotonic()
+
+    def _run_build(self, job: IngestJob, steps: Callable[[], Iterator[Tuple[FAISS, float]]]):
+        vectorstore = None
+        published_chunks, published_at = 0, 0.0
+        try:
+            for vectorstore, fraction in steps():
+                job.fraction, job.chunks = min(fraction, 0.99), vectorstore.index.ntotal
+                if (not published_chunks or job.chunks >= published_chunks * SNAPSHOT_GROWTH
+                        or time.monotonic() - published_at >= SNAPSHOT_INTERVAL_S):
+                    self._publish(job, snapshot_index(vectorstore))
+                    published_chunks, published_at = job.chunks, time.monotonic()
+                    job.searchable_fraction = job.fraction
+                if not job.first_batch.is_set():
+                    job.first_batch_s = time.monotonic() - job.started
+                    job.first_batch.set()
+            if vectorstore is None:
+                raise ValueError("No text could be extracted from the document.")
+            self._save(job.doc_id, job.name, vectorstore, job.fingerprint)
+            del vectorstore  # The in-RAM copy is replaced by the memory-mapped one
+            self._publish(job, load_index_mmap(self._path(job.doc_id)))
+            job.fraction = job.searchable_fraction = 1.0
+        except Exception as e:
+            job.error = str(e)
+            with self._lock:
+                self._entries.pop(job.doc_id, None)
+        finally:
+            job.first_batch.set()
+            job.finished.set()
+
+    # Function to look up the background indexing job for a document, if any
+    def progress(self, doc_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(doc_id)
+
+    # Reference counting: each session holds at most one document at a time
+    def acquire(self, doc_id: str, session_id: str):
+        self.get(doc_id)  # Reload the index if it was evicted
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.doc_id != doc_id:
+                    entry.sessions.pop(session_id, None)
+            entry = self._entries.get(doc_id)
+            if entry is not None:
+                entry.sessions[session_id] = time.monotonic()
+        self.evict_idle()
+
+    def release(self, doc_id: str, session_id: str):
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is not None:
+                entry.sessions.pop(session_id, None)
+
+    def touch(self, doc_id: str, session_id: str):
+        self.acquire(doc_id, session_id)
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            for doc_id, entry in list(self._entries.items()):
+                # Sessions that stopped rerunning are treated as gone
+                for session_id, seen in list(entry.sessions.items()):
+                    if now - seen > self.idle_ttl_s:
+                        del entry.sessions[session_id]
+                if not entry.sessions and now - entry.last_used > self.idle_ttl_s:
+                    del self._entries[doc_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "loaded": len(self._entries),
+                "sessions": sum(len(entry.sessions) for entry in self._entries.values()),
+            }
+
+
+# Function to list the prebuilt bundles in a bundle directory
+def bundle_paths(bundle_dir: str) -> List[Path]:
+    bundle_root = Path(bundle_dir)
+    if not bundle_root.is_dir():
+        return []
+    return [
+        bundle for bundle in sorted(bundle_root.iterdir())
+        if not bundle.name.startswith(".") and (bundle / "meta.json").exists() and (bundle / "docstore.json").exists()
+    ]
+
+
+# Function to list the bundled documents (the only ones every session may open)
+# (user uploads stay private to the sessions that uploaded them)
+def bundled_documents(bundle_dir: str = DEFAULT_BUNDLE_DIR) -> List[Dict[str, object]]:
+    return [{"doc_id": bundle.name, **json.loads((bundle / "meta.json").read_text())} for bundle in bundle_paths(bundle_dir)]
+
+
+# One library per process, shared by the app's sessions and its warm-up
+_shared_library: Optional[DocumentLibrary] = None
+_shared_library_lock = threading.Lock()
+
+
+def shared_library() -> DocumentLibrary:
+    global _shared_library
+    with _shared_library_lock:
+        if _shared_library is None:
+            _shared_library = DocumentLibrary()
+        return _shared_library
+
+
+# Function to import the prebuilt bundles and load them into RAM (worker warm-up)
+# (only the bundled documents, or the ``doc_ids`` given in warmup.json, are preloaded;
+# user uploads are loaded on first use and evicted when idle as usual)
+def warm_library(bundle_dir: str = DEFAULT_BUNDLE_DIR, doc_ids: Optional[List[str]] = None) -> List[str]:
+    library = shared_library()
+    library.import_bundles(bundle_dir)
+    if doc_ids is None:
+        doc_ids = [bundle.name for bundle in bundle_paths(bundle_dir)]
+    doc_ids = [doc_id for doc_id in doc_ids if library.is_built(doc_id)]
+    library.preload(doc_ids)
+    return doc_ids
+
+
+class LibraryHandle:
+    """
+    Stand-in for a vector store that looks the index up in the library by
+    document id on every call, so session state never pins an index in RAM.
+    """
+
+    def __init__(self, library: DocumentLibrary, doc_id: str):
+        self.library = library
+        self.doc_id = doc_id
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        vectorstore = self.library.get(self.doc_id)
+        if vectorstore is None:
+            raise LookupError(f"Document {self.doc_id} is no longer in the library.")
+        return getattr(vectorstore, name)
+
+    # Handles are references, so copies share the same library
+    def __deepcopy__(self, memo):
+        return self
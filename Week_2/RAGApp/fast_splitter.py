@@ -0,0 +1,195 @@
+import re
+from array import array
+from typing import Iterable, List, Sequence, Tuple
+
+from langchain.schema import Document
+
+from context_packer import get_encoding
+from settings import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+
+# A line together with the newlines that end it
+LINE_PATTERN = re.compile(r"[^\n]*\n+|[^\n]+")
+# A word together with the whitespace that follows it
+WORD_PATTERN = re.compile(r"\S+\s*|\s+")
+
+# Strength of the boundary at the end of a unit (higher is a better place to cut)
+WORD_BREAK, LINE_BREAK, PARAGRAPH_BREAK = 0, 1, 2
+
+# How many pieces go into one tiktoken batch call (bounds the token lists held at once)
+ENCODE_BATCH_PIECES = 4096
+
+Span = Tuple[int, int]  # (offset, length) into the source text
+
+
+class Units:
+    """Consecutive pieces of one text: where each ends, how strong that boundary is, and its token count."""
+
+    def __init__(self):
+        self.starts = array("q")
+        self.ends = array("q")
+        self.levels = array("b")
+        self.tokens = array("l")
+
+
+class FastTokenSplitter:
+    """
+    Single-pass splitter that sizes chunks in ``tiktoken`` tokens.
+
+    Separator boundaries are found with precompiled regexes over the whole
+    text. Lines are the basic units; lines longer than a chunk are split into
+    words, and words longer than a chunk into fixed windows. Units are
+    token-counted with batched ``encode_ordinary_batch`` calls and packed
+    greedily into chunks. A full chunk is cut at the strongest boundary
+    (paragraph, then line) in its second half. Chunks are produced as
+    ``(offset, length)`` spans, and only ``split_documents`` copies text out.
+
+    Drop-in for ``RecursiveCharacterTextSplitter(..., add_start_index=True)``.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_TOKENS, chunk_overlap: int = CHUNK_OVERLAP_TOKENS, model_name: str = "gpt-4o"):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding = get_encoding(model_name)
+
+    # Function to count the tokens of many pieces with batched (multi-threaded) encoding
+    def _count_tokens(self, pieces: Sequence[str]) -> List[int]:
+        counts: List[int] = []
+        for start in range(0, len(pieces), ENCODE_BATCH_PIECES):
+            batch = self.encoding.encode_ordinary_batch(list(pieces[start:start + ENCODE_BATCH_PIECES]))
+            counts.extend(len(tokens) for tokens in batch)
+        return counts
+
+    # Function to cut texts into units no larger than a chunk, with token counts
+    def _units(self, texts: Sequence[str]) -> List[Units]:
+        # Lines first, counted in one batch across every text
+        lines = [
+            [(m.start(), m.end(), PARAGRAPH_BREAK if text.endswith("\n\n", m.start(), m.end()) else
+              LINE_BREAK if text[m.end() - 1] == "\n" else WORD_BREAK) for m in LINE_PATTERN.finditer(text)]
+            for text in texts
+        ]
+        line_tokens = iter(self._count_tokens([text[s:e] for text, spans in zip(texts, lines) for s, e, _ in spans]))
+
+        # Lines longer than a chunk are split into words (also counted in one batch)
+        pending = []  # (text index, start, end, level) for oversized lines
+        units_per_text = []
+        for index, (text, spans) in enumerate(zip(texts, lines)):
+            units = Units()
+            for start, end, level in spans:
+                tokens = next(line_tokens)
+                if tokens > self.chunk_size:
+                    pending.append((index, len(units.starts), start, end, level))
+                units.starts.append(start)
+                units.ends.append(end)
+                units.levels.append(level)
+                units.tokens.append(tokens)
+            units_per_text.append(units)
+        if not pending:
+            return units_per_text
+
+        words = [
+            [(m.start(), m.end()) for m in WORD_PATTERN.finditer(texts[index], start, end)]
+            for index, _, start, end, _ in pending
+        ]
+        word_tokens = iter(self._count_tokens([texts[p[0]][s:e] for p, spans in zip(pending, words) for s, e in spans]))
+        replacements = {}
+        for (index, position, _, _, level), spans in zip(pending, words):
+            pieces = []
+            for word_index, (start, end) in enumerate(spans):
+                tokens = next(word_tokens)
+                word_level = level if word_index == len(spans) - 1 else WORD_BREAK
+                if tokens > self.chunk_size:
+                    pieces.extend(self._windows(texts[index], start, end, tokens, word_level))
+                else:
+                    pieces.append((start, end, word_level, tokens))
+            replacements[(index, position)] = pieces
+
+        # Rebuild the unit arrays of the texts that had oversized lines
+        for index in {p[0] for p in pending}:
+            old, new = units_per_text[index], Units()
+            for position in range(len(old.starts)):
+                pieces = replacements.get((index, position))
+                if pieces is None:
+                    pieces = [(old.starts[position], old.ends[position], old.levels[position], old.tokens[position])]
+                for start, end, level, tokens in pieces:
+                    new.starts.append(start)
+                    new.ends.append(end)
+                    new.levels.append(level)
+                    new.tokens.append(tokens)
+            units_per_text[index] = new
+        return units_per_text
+
+    # Function to hard-split a single run of text that is longer than a chunk
+    def _windows(self, text: str, start: int, end: int, tokens: int, level: int) -> List[Tuple[int, int, int, int]]:
+        parts = -(-tokens // self.chunk_size)
+        step = -(-(end - start) // parts)
+        bounds = [(s, min(s + step, end)) for s in range(start, end, step)]
+        counts = self._count_tokens([text[s:e] for s, e in bounds])
+        return [(s, e, level if e == end else WORD_BREAK, count) for (s, e), count in zip(bounds, counts)]
+
+    # Function to pack units greedily into chunk spans, cutting at the best nearby boundary
+    def _pack(self, text: str, units: Units) -> List[Span]:
+        spans: List[Span] = []
+        count = len(units.starts)
+        i = 0
+        while i < count:
+            tokens = 0
+            j = i
+            best = {PARAGRAPH_BREAK: (i, 0), LINE_BREAK: (i, 0)}
+            while j < count and tokens + units.tokens[j] <= self.chunk_size:
+                tokens += units.tokens[j]
+                j += 1
+                level = units.levels[j - 1]
+                if level >= LINE_BREAK:
+                    best[LINE_BREAK] = (j, tokens)
+                    if level == PARAGRAPH_BREAK:
+                        best[PARAGRAPH_BREAK] = (j, tokens)
+            if j == i:
+                j = i + 1  # A single unit that doesn't fit on its own
+            elif j < count:
+                # The chunk is full: prefer ending on a paragraph, then a line, if that keeps it at least half full
+                for level in (PARAGRAPH_BREAK, LINE_BREAK):
+                    cut, cut_tokens = best[level]
+                    if cut > i and cut_tokens * 2 >= self.chunk_size:
+                        j = cut
+                        break
+
+            start, end = units.starts[i], units.ends[j - 1]
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if end > start:
+                spans.append((start, end - start))
+
+            # Step back over whole units to overlap with the next chunk
+            k, overlap = j, 0
+            while k - 1 > i and overlap + units.tokens[k - 1] <= self.chunk_overlap:
+                k -= 1
+                overlap += units.tokens[k]
+            i = k if j < count else count
+        return spans
+
+    # Function to split several texts into chunk spans, token-counting them all together
+    def split_spans_batch(self, texts: Sequence[str]) -> List[List[Span]]:
+        return [self._pack(text, units) for text, units in zip(texts, self._units(texts))]
+
+    def split_spans(self, text: str) -> List[Span]:
+        return self.split_spans_batch([text])[0]
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[offset:offset + length] for offset, length in self.split_spans(text)]
+
+    # Function to split documents into chunk documents, recording each chunk's start_index
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        documents = list(documents)
+        chunks = []
+        for document, spans in zip(documents, self.split_spans_batch([d.page_content for d in documents])):
+            text = document.page_content
+            for offset, length in spans:
+                chunks.append(Document(
+                    page_content=text[offset:offset + length],
+                    metadata={**document.metadata, "start_index": offset},
+                ))
+        return chunks
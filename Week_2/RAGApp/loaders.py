@@ -0,0 +1,128 @@
+import codecs
+import io
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Union
+
+import docx2txt
+from pypdf import PdfReader
+from langchain.schema import Document
+
+# Size of the blocks a text file is decoded in
+TEXT_BLOCK_BYTES = 64 * 1024
+
+SUPPORTED_EXTENSIONS = ["pdf", "txt", "docx", "doc"]
+
+Buffer = Union[bytes, bytearray, memoryview, io.BytesIO]
+
+
+# Function to get a zero-copy view of the upload buffer
+def as_memoryview(data: Buffer) -> memoryview:
+    if isinstance(data, io.BytesIO):
+        return data.getbuffer()
+    return memoryview(data)
+
+
+class MemoryviewReader(io.RawIOBase):
+    """Read-only, seekable raw stream over a memoryview (io.BytesIO would copy it)."""
+
+    def __init__(self, view: memoryview):
+        self.view = view.cast("B")
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self.view[self.position:self.position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.view)}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+
+# Function to get a seekable binary stream over the upload buffer
+def as_stream(data: Buffer) -> io.BufferedIOBase:
+    if isinstance(data, io.BytesIO):
+        data.seek(0)
+        return data
+    if isinstance(data, memoryview):
+        return io.BufferedReader(MemoryviewReader(data))
+    return io.BytesIO(data)
+
+
+# Function to parse PDF pages one at a time straight from memory
+def iter_pdf_pages(data: Buffer, source: str) -> Iterator[Document]:
+    reader = PdfReader(as_stream(data))
+    for page_number, page in enumerate(reader.pages):
+        yield Document(page_content=page.extract_text() or "", metadata={"source": source, "page": page_number})
+
+
+# Function to decode a text file block by block, cutting blocks at line breaks
+def iter_text_blocks(data: Buffer, source: str, encoding: str = "utf-8") -> Iterator[Document]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    carry = ""
+    block_number = 0
+    with as_memoryview(data) as view:
+        for start in range(0, len(view), TEXT_BLOCK_BYTES):
+            text = carry + decoder.decode(view[start:start + TEXT_BLOCK_BYTES])
+            cut = text.rfind("\n") + 1
+            if cut == 0:
+                carry = text  # No line break yet, keep reading
+                continue
+            carry = text[cut:]
+            yield Document(page_content=text[:cut], metadata={"source": source, "page": block_number})
+            block_number += 1
+    carry += decoder.decode(b"", final=True)
+    if carry:
+        yield Document(page_content=carry, metadata={"source": source, "page": block_number})
+
+
+# Function to extract the text of a Word document from memory
+def iter_docx_text(data: Buffer, source: str) -> Iterator[Document]:
+    yield Document(page_content=docx2txt.process(as_stream(data)), metadata={"source": source})
+
+
+# Function to pick the loader for an uploaded file (no temp files involved)
+def load_pages(data: Buffer, file_name: str) -> Iterator[Document]:
+    file_extension = file_name.split('.')[-1].lower()
+    if file_extension == 'pdf':
+        return iter_pdf_pages(data, file_name)
+    elif file_extension == 'txt':
+        return iter_text_blocks(data, file_name)
+    elif file_extension in ['docx', 'doc']:
+        return iter_docx_text(data, file_name)
+    raise ValueError(f"Unsupported file format: {file_extension}")
+
+
+# Function to estimate how many pages (or text blocks) a loader will yield
+def count_pages(data: Buffer, file_name: str) -> int:
+    file_extension = file_name.split('.')[-1].lower()
+    if file_extension == 'pdf':
+        return len(PdfReader(as_stream(data)).pages)
+    elif file_extension == 'txt':
+        with as_memoryview(data) as view:
+            return max(1, -(-len(view) // TEXT_BLOCK_BYTES))
+    return 1
+
+
+# Function to group pages into batches so only one batch is held at a time
+# (a smaller first batch gets the first results out sooner)
+def iter_batches(pages: Iterable[Document], batch_size: int, first_batch_size: Optional[int] = None) -> Iterator[List[Document]]:
+    pages = iter(pages)
+    size = first_batch_size or batch_size
+    while True:
+        batch = list(islice(pages, size))
+        if not batch:
+            return
+        yield batch
+        size = batch_size
@@ -0,0 +1,98 @@
+import importlib.util
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from settings import LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_BATCH_SIZE, EMBEDDING_DTYPES
+
+INT8_SCALE = 127.0
+
+# Longest input (in model tokens) that is embedded; MiniLM-class models are trained on 256
+MAX_SEQUENCE_LENGTH = 256
+
+
+# Function to check for optional local embedding support (pip install transformers torch)
+def local_embeddings_available() -> bool:
+    return all(importlib.util.find_spec(name) is not None for name in ("transformers", "torch"))
+
+
+# Function to round unit vectors to the output precision
+def quantize(vectors: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "float16":
+        return vectors.astype(np.float16)
+    if dtype == "int8":
+        return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+    return vectors.astype(np.float32)
+
+
+# Function to build an empty FAISS index that stores vectors at the output precision
+def make_index(dimension: int, dtype: str):
+    import faiss
+
+    if dtype == "float16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    if dtype == "int8":
+        # Values are already integers in int8 range, so no training is needed
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit_direct_signed, faiss.METRIC_L2)
+    return faiss.IndexFlatL2(dimension)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Sentence embeddings computed on the CPU with a MiniLM-class transformer
+    (mean pooling over the last hidden state, L2-normalised), as
+    sentence-transformers does for these models. Texts are sorted by length
+    and embedded in batches of ``batch_size`` so padding stays small; torch
+    spreads each batch over ``num_threads`` cores. Vectors come out at
+    ``output_dtype`` precision, and ``make_index()`` stores them at that
+    precision too.
+
+    ``model`` and ``tokenizer`` can be passed in (e.g. a tiny random model
+    for offline checks) instead of being loaded from ``model_name``.
+    """
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+                 output_dtype: str = "float32", num_threads: Optional[int] = None, model=None, tokenizer=None):
+        if output_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"output_dtype must be one of {EMBEDDING_DTYPES}")
+        # Imported here so torch is only loaded when local embeddings are used
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        torch.set_num_threads(num_threads or os.cpu_count() or 1)
+        self.torch = torch
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.output_dtype = output_dtype
+        self.tokenizer = tokenizer if tokenizer is not None else AutoTokenizer.from_pretrained(model_name)
+        self.model = (model if model is not None else AutoModel.from_pretrained(model_name)).eval()
+        self.dimension = self.model.config.hidden_size
+        self._lock = threading.Lock()
+
+    # Function to embed one padded batch into unit vectors
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_SEQUENCE_LENGTH, return_tensors="pt")
+        with self.torch.inference_mode():
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            return self.torch.nn.functional.normalize(pooled, dim=-1).numpy()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into an array of ``output_dtype`` vectors, in input order."""
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        with self._lock:  # One batch at a time; each batch already uses every thread
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                vectors[batch] = self._embed_batch([texts[i] for i in batch])
+        return quantize(vectors, self.output_dtype)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].astype(np.float32).tolist()
@@ -1,121 +1,347 @@
 import os
-import tempfile
+import uuid
 import streamlit as st
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
-from langchain.prompts import PromptTemplate
+from settings import (
+    CHUNK_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    PAGE_BATCH_SIZE,
+    FIRST_PAGE_BATCH_SIZE,
+    INDEX_POLL_S,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKENDS,
+    LOCAL_EMBEDDING_MODEL,
+    EMBEDDING_DTYPES,
+    INDEX_FINGERPRINT,
+    index_fingerprint,
+    DEFAULT_TOKEN_BUDGET,
+    DEFAULT_BASELINE_K,
+    RERANK_METHODS,
+    DEFAULT_LATENCY_BUDGET_MS,
+    CONDENSE_MODELS,
+)
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repo's common/ package
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.profiler import profile_reruns
+from common.prompt_cache import PromptLayout, PromptCacheStats, langchain_cache_callback
+from common.warmup import start_warmup, openai_http_client
+from common.transcript import Transcript, langchain_history
+
+# Heavy imports (LangChain, FAISS, loaders) are done lazily inside the
+# functions below so the first paint doesn't wait on them.
 
 # Set page configuration
 st.set_page_config(page_title="Document Q&A Bot", layout="wide")
+
+# Opt-in rerun profiler (STREAMLIT_PROFILE=1 or ?profile=1)
+profile_reruns(__file__)
+
+# Worker warm-up (imports, provider connections, prebuilt indexes); a no-op after the first rerun
+start_warmup(__file__)
+
 st.title("Document Q&A Bot")
 
 # Initialize session state variables
 if "conversation" not in st.session_state:
     st.session_state.conversation = None
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+if "transcript" not in st.session_state:
+    st.session_state.transcript = Transcript()
 if "document_processed" not in st.session_state:
     st.session_state.document_processed = False
+if "doc_id" not in st.session_state:
+    st.session_state.doc_id = None
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "answer_notes" not in st.session_state:
+    st.session_state.answer_notes = {}
+if "prompt_cache" not in st.session_state:
+    st.session_state.prompt_cache = PromptCacheStats()
 
 # OpenAI API Key input
 api_key = st.sidebar.text_input("Enter your OpenAI API Key:", type="password")
 os.environ["OPENAI_API_KEY"] = api_key
 
-# Function to process uploaded document
-def process_document(uploaded_file):
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.' + uploaded_file.name.split('.')[-1]) as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_path = tmp_file.name
-    
-    # Load document based on file type
-    file_extension = uploaded_file.name.split('.')[-1].lower()
-    
-    if file_extension == 'pdf':
-        loader = PyPDFLoader(tmp_path)
-    elif file_extension == 'txt':
-        loader = TextLoader(tmp_path)
-    elif file_extension in ['docx', 'doc']:
-        loader = Docx2txtLoader(tmp_path)
+# Embeddings: OpenAI, or a local CPU model (no network round-trip per question, no cost per token)
+embedding_backend = st.sidebar.selectbox("Embeddings:", EMBEDDING_BACKENDS)
+embedding_dtype = "float32"
+if embedding_backend != "OpenAI":
+    from local_embeddings import local_embeddings_available
+    if local_embeddings_available():
+        embedding_dtype = st.sidebar.selectbox("Local vector precision:", EMBEDDING_DTYPES, help="float16/int8 indexes take 2x/4x less memory")
     else:
-        st.error(f"Unsupported file format: {file_extension}")
-        os.unlink(tmp_path)  # Clean up temp file
+        st.sidebar.warning("Local embeddings need `pip install transformers torch`; using OpenAI embeddings.")
+        embedding_backend = "OpenAI"
+index_settings = INDEX_FINGERPRINT if embedding_backend == "OpenAI" else index_fingerprint(LOCAL_EMBEDDING_MODEL, embedding_dtype)
+
+# Token budget for the retrieved context sent to the LLM
+token_budget = st.sidebar.number_input("Context token budget:", min_value=200, max_value=8000, value=DEFAULT_TOKEN_BUDGET, step=100)
+
+# Optional CPU reranking of over-fetched candidates
+rerank_method = st.sidebar.selectbox("Reranker:", RERANK_METHODS)
+rerank_budget_ms = st.sidebar.number_input("Reranking latency budget (ms):", min_value=10, max_value=2000, value=DEFAULT_LATENCY_BUDGET_MS, step=10)
+
+# Retrieve for the raw question while the follow-up is being condensed
+speculative_retrieval = st.sidebar.checkbox("Speculative retrieval", value=True)
+condense_model = st.sidebar.selectbox("Model for condensing follow-up questions:", CONDENSE_MODELS)
+
+# Load the reranker once per process (the cross-encoder model is shared by all sessions;
+# the latency budget is passed with each call, so it isn't part of the cache key)
+@st.cache_resource
+def load_reranker(method):
+    from reranker import make_reranker
+    return make_reranker(method)
+
+# Heavy objects are built once per process and shared by every session
+@st.cache_resource
+def load_llm(api_key, model="gpt-4o"):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(temperature=0, model=model, api_key=api_key, http_client=openai_http_client())
+
+# Load the local embedding model once per process (shared by every output precision)
+@st.cache_resource
+def load_local_embedding_model():
+    from transformers import AutoModel, AutoTokenizer
+    return AutoModel.from_pretrained(LOCAL_EMBEDDING_MODEL), AutoTokenizer.from_pretrained(LOCAL_EMBEDDING_MODEL)
+
+@st.cache_resource
+def load_embeddings(api_key, backend="OpenAI", dtype="float32"):
+    if backend != "OpenAI":
+        from local_embeddings import LocalEmbeddings
+        model, tokenizer = load_local_embedding_model()
+        return LocalEmbeddings(output_dtype=dtype, model=model, tokenizer=tokenizer)
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=EMBEDDING_MODEL, api_key=api_key, http_client=openai_http_client())
+
+@st.cache_resource
+def load_text_splitter():
+    from fast_splitter import FastTokenSplitter
+    # Token-sized chunks; start_index lets the context packer merge neighbouring chunks
+    return FastTokenSplitter(chunk_size=CHUNK_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS)
+
+@st.cache_resource
+def load_qa_prompt():
+    from langchain.prompts import PromptTemplate
+    return PromptTemplate(
+        template=qa_template,
+        input_variables=["context", "chat_history", "question"]
+    )
+
+# Indexes are shared by every session in the process (and memory-mapped across processes);
+# the warm-up imports prebuilt bundles into the same library (done here too, in case it hasn't yet)
+@st.cache_resource
+def load_library():
+    from doc_library import DEFAULT_BUNDLE_DIR, shared_library
+    library = shared_library()
+    library.import_bundles(DEFAULT_BUNDLE_DIR)
+    return library
+
+# Selectbox option for searching every bundled document at once
+ALL_DOCUMENTS = "*"
+
+# One routed index over the bundled documents per set of embedding settings
+@st.cache_resource
+def load_collection(fingerprint):
+    from sharded_index import ShardedIndex
+    return ShardedIndex(load_library(), [])
+
+# Function to start indexing an uploaded document in the background
+def process_document(library, doc_id, uploaded_file):
+    from doc_library import new_vectorstore
+    from loaders import load_pages, iter_batches, count_pages
+
+    if library.is_built(doc_id):
         return None
-    
-    documents = loader.load()
-    
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.split_documents(documents)
-    
-    # Create embeddings and vector store
-    embeddings = OpenAIEmbeddings()
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    
-    # Clean up temp file
-    os.unlink(tmp_path)
-    
-    return vectorstore
 
-# Custom prompt template
-qa_template = """
-You are a helpful AI assistant that answers questions based ONLY on the provided document.
-If the question cannot be answered using the document information, politely decline to answer and explain that you can only provide information from the uploaded document.
+    # The job reads a view of the upload's buffer (no copy); the view keeps it alive after this rerun
+    data = uploaded_file.getbuffer()
+    file_name = uploaded_file.name
+    try:
+        pages = load_pages(data, file_name)
+        total_pages = count_pages(data, file_name)
+    except Exception as e:
+        st.error(str(e))
+        return None
+
+    text_splitter = load_text_splitter()
+    embeddings = load_embeddings(api_key, embedding_backend, embedding_dtype)
+
+    # Split and embed one batch of pages at a time; each batch becomes searchable as soon as it is done
+    def steps():
+        vectorstore = None
+        pages_done = 0
+        for batch in iter_batches(pages, PAGE_BATCH_SIZE, FIRST_PAGE_BATCH_SIZE):
+            pages_done += len(batch)
+            chunks = text_splitter.split_documents(batch)
+            if not chunks:
+                continue
+            if vectorstore is None:
+                vectorstore = new_vectorstore(chunks, embeddings)
+            else:
+                vectorstore.add_documents(chunks)
+            yield vectorstore, pages_done / total_pages
+
+    return library.start_build(doc_id, file_name, steps, index_settings)
 
-Context: {context}
+# Poll the background indexing job without rerunning the whole page
+@st.fragment(run_every=INDEX_POLL_S)
+def show_indexing_progress(library, doc_id):
+    job = library.progress(doc_id)
+    if not job.running:
+        st.rerun()  # Swap the progress bar for the final status
+    st.progress(job.fraction, text=f"Indexing '{job.name}': {job.fraction:.0%} ({job.chunks} chunks). You can ask questions already.")
 
-Chat History: {chat_history}
+# Function to build the conversational chain for a processed document
+# (the chain's memory reads and writes the session transcript, so turns are stored once)
+def build_conversation(vectorstore, embeddings, transcript):
+    from langchain.memory import ConversationBufferMemory
+    from context_packer import PackedRetriever
+    from speculative_chain import SpeculativeRetrievalChain
 
-Question: {question}
+    # Create memory and retrieval chain
+    memory = ConversationBufferMemory(chat_memory=langchain_history(transcript), memory_key="chat_history", return_messages=True)
+    return SpeculativeRetrievalChain.from_llm(
+        llm=load_llm(api_key),
+        condense_question_llm=load_llm(api_key, condense_model),
+        speculate=speculative_retrieval,
+        retriever=PackedRetriever(
+            vectorstore=vectorstore,
+            embeddings=embeddings,
+            token_budget=token_budget,
+            reranker=load_reranker(rerank_method),
+            rerank_budget_ms=rerank_budget_ms,
+        ),
+        memory=memory,
+        combine_docs_chain_kwargs={"prompt": load_qa_prompt()}
+    )
 
-Answer:
-"""
+# Custom prompt template, laid out so the provider can cache everything before the retrieved context
+qa_template = (
+    PromptLayout()
+    .stable(
+        "You are a helpful AI assistant that answers questions based ONLY on the provided document.\n"
+        "If the question cannot be answered using the document information, politely decline to answer "
+        "and explain that you can only provide information from the uploaded document."
+    )
+    .history("{chat_history}", heading="Chat History")
+    .volatile("{context}", heading="Context")
+    .volatile("{question}", heading="Question")
+    .volatile("Answer:")
+    .render()
+)
 
 # File uploader
 uploaded_file = st.sidebar.file_uploader("Upload a document (PDF, TXT, DOCX)", type=["pdf", "txt", "docx"])
 
-if uploaded_file and api_key:
-    with st.spinner("Processing document..."):
-        # Process the document and create the conversational chain
-        vectorstore = process_document(uploaded_file)
-        
-        if vectorstore:
-            # Create memory and retrieval chain
-            memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-            
-            # Create prompt
-            PROMPT = PromptTemplate(
-                template=qa_template,
-                input_variables=["context", "chat_history", "question"]
-            )
-            
-            # Create chain
-            llm = ChatOpenAI(temperature=0, model="gpt-4o")
-            st.session_state.conversation = ConversationalRetrievalChain.from_llm(
-                llm=llm,
-                retriever=vectorstore.as_retriever(search_kwargs={"k": 4}),
-                memory=memory,
-                combine_docs_chain_kwargs={"prompt": PROMPT}
+# Function to switch this session to a document in the shared library
+def open_document(library, doc_id):
+    from doc_library import LibraryHandle
+
+    if st.session_state.doc_id:
+        library.release(st.session_state.doc_id, st.session_state.session_id)
+    library.acquire(doc_id, st.session_state.session_id)
+
+    # Session state only keeps the document id; the index stays in the library
+    st.session_state.doc_id = doc_id
+    st.session_state.transcript = Transcript()
+    st.session_state.conversation = build_conversation(LibraryHandle(library, doc_id), load_embeddings(api_key, embedding_backend, embedding_dtype), st.session_state.transcript)
+    st.session_state.answer_notes = {}
+    st.session_state.document_processed = True
+
+# Function to switch this session to routed search over every bundled document
+def open_collection(library, collection):
+    if st.session_state.doc_id:
+        library.release(st.session_state.doc_id, st.session_state.session_id)
+
+    st.session_state.doc_id = ALL_DOCUMENTS
+    st.session_state.transcript = Transcript()
+    st.session_state.conversation = build_conversation(collection, load_embeddings(api_key, embedding_backend, embedding_dtype), st.session_state.transcript)
+    st.session_state.answer_notes = {}
+    st.session_state.document_processed = True
+
+if api_key:
+    library = load_library()
+    doc_id = None
+    doc_name = None
+
+    if uploaded_file:
+        from doc_library import document_id
+
+        doc_id = document_id(uploaded_file, index_settings)
+        doc_name = uploaded_file.name
+        if doc_id != st.session_state.doc_id:
+            # Embed the document only if no other session has done so already
+            job = process_document(library, doc_id, uploaded_file)
+            if job is not None:
+                # The chat opens as soon as the first batch is searchable
+                with st.spinner("Indexing the first pages..."):
+                    job.first_batch.wait()
+                if job.error:
+                    st.error(job.error)
+            if library.get(doc_id) is not None:
+                open_document(library, doc_id)
+    else:
+        from doc_library import bundled_documents
+
+        # The deployment's bundled documents can be opened without uploading; uploads are never listed
+        # (only those indexed with the embeddings chosen here; older bundles were all built with OpenAI)
+        shared_names = {
+            doc["doc_id"]: doc["name"] for doc in bundled_documents()
+            if doc.get("fingerprint", INDEX_FINGERPRINT) == index_settings and library.is_built(doc["doc_id"])
+        }
+        if shared_names:
+            options = [None] + list(shared_names) + ([ALL_DOCUMENTS] if len(shared_names) > 1 else [])
+            doc_id = st.sidebar.selectbox(
+                "...or open a bundled document:",
+                options,
+                format_func=lambda d: "" if d is None else "📚 All bundled documents (routed search)" if d == ALL_DOCUMENTS else shared_names[d],
             )
-            st.session_state.document_processed = True
-            st.sidebar.success(f"Document '{uploaded_file.name}' processed successfully!")
+            doc_name = shared_names.get(doc_id)
+            if doc_id == ALL_DOCUMENTS:
+                # Routing picks up documents bundled since the last rerun
+                collection = load_collection(index_settings)
+                collection.set_shards(list(shared_names))
+                doc_name = f"{len(shared_names)} bundled documents"
+                if st.session_state.doc_id != ALL_DOCUMENTS or st.session_state.conversation.retriever.vectorstore is not collection:
+                    open_collection(library, collection)
+            elif doc_id and doc_id != st.session_state.doc_id:
+                open_document(library, doc_id)
+
+    if doc_id and st.session_state.doc_id == doc_id:
+        if doc_id != ALL_DOCUMENTS:
+            library.touch(doc_id, st.session_state.session_id)
+
+        # Pick up sidebar changes without rebuilding the chain
+        retriever = st.session_state.conversation.retriever
+        retriever.embeddings = load_embeddings(api_key, embedding_backend, embedding_dtype)
+        retriever.token_budget = token_budget
+        retriever.reranker = load_reranker(rerank_method)
+        retriever.rerank_budget_ms = rerank_budget_ms
+        st.session_state.conversation.speculate = speculative_retrieval
+        st.session_state.conversation.question_generator.llm = load_llm(api_key, condense_model)
+
+        job = library.progress(doc_id)
+        if job is not None and job.running:
+            with st.sidebar:
+                show_indexing_progress(library, doc_id)
+        elif job is not None and job.error:
+            st.sidebar.error(f"Indexing '{doc_name}' failed: {job.error}")
+        else:
+            st.sidebar.success(f"Document '{doc_name}' processed successfully!")
+        library_stats = library.stats()
+        st.sidebar.caption(f"Shared library: {library_stats['loaded']} documents loaded, {library_stats['sessions']} active sessions")
 
 # Chat interface
 if st.session_state.document_processed:
     st.subheader("Ask questions about your document")
     
     # Display chat history
-    for i, message in enumerate(st.session_state.chat_history):
-        if i % 2 == 0:  # User message
-            with st.chat_message("user"):
-                st.write(message.content)
-        else:  # AI message
-            with st.chat_message("assistant"):
-                st.write(message.content)
+    for i, (role, text) in enumerate(st.session_state.transcript):
+        with st.chat_message(role):
+            st.write(text)
+            if i in st.session_state.answer_notes:
+                st.caption(st.session_state.answer_notes[i])
     
     # User input
     user_question = st.chat_input("Ask a question about your document")
@@ -124,20 +350,55 @@ if st.session_state.document_processed:
         with st.chat_message("user"):
             st.write(user_question)
         
+        # Note when the answer could only draw on part of the document
+        job = load_library().progress(st.session_state.doc_id)
+        partial_note = None
+        if job is not None and job.running:
+            partial_note = f"⏳ Answered from the first {job.searchable_fraction:.0%} of the document; indexing is still running."
+
         with st.spinner("Thinking..."):
-            from langchain.schema import HumanMessage, AIMessage
-            
-            # Get conversation response
-            response = st.session_state.conversation.invoke({"question": user_question})
+            # Get conversation response (the chain's memory adds the turn to the transcript)
+            # (the callback records the prompt-cache usage of the condense and answer calls)
+            response = st.session_state.conversation.invoke(
+                {"question": user_question},
+                config={"callbacks": [langchain_cache_callback(st.session_state.prompt_cache)]},
+            )
             ai_response = response["answer"]
-            
-            # Update chat history
-            st.session_state.chat_history.append(HumanMessage(content=user_question))
-            st.session_state.chat_history.append(AIMessage(content=ai_response))
         
         # Display AI response
         with st.chat_message("assistant"):
             st.write(ai_response)
+            if partial_note:
+                st.session_state.answer_notes[len(st.session_state.transcript) - 1] = partial_note
+                st.caption(partial_note)
+
+        # Show how many prompt tokens the context packer saved
+        stats = st.session_state.conversation.retriever.last_stats
+        if stats:
+            st.caption(
+                f"Context: {stats['packed_tokens']} tokens from {stats['chunks']} chunks "
+                f"({stats['tokens_saved']} tokens saved vs. top-{DEFAULT_BASELINE_K} retrieval)"
+                + (f", reranked in {stats['rerank_ms']} ms" if "rerank_ms" in stats else "")
+            )
+
+        # Show how many shards the routed search had to visit
+        if stats and stats.get("route"):
+            route = stats["route"]
+            st.caption(f"Routed search: {route['searched']} of {route['shards']} documents searched in {route['elapsed_ms']} ms")
+
+        # Show whether retrieval for the raw question could be reused
+        conversation = st.session_state.conversation
+        if conversation.last_speculation in ("hits", "misses"):
+            outcome = "hit" if conversation.last_speculation == "hits" else "miss"
+            st.caption(
+                f"Speculative retrieval: {outcome} this turn, hit rate {conversation.hit_rate():.0%} "
+                f"({conversation.speculation_stats['hits']}/{conversation.speculation_stats['hits'] + conversation.speculation_stats['misses']} follow-ups)"
+            )
+
+        # Show how much of the prompts the provider served from its prompt cache
+        if st.session_state.prompt_cache.last is not None:
+            last = st.session_state.prompt_cache.last
+            st.caption(f"{st.session_state.prompt_cache.describe()}; this turn {last.cached_tokens}/{last.prompt_tokens} tokens")
 else:
     if not api_key:
         st.info("Please enter your OpenAI API key in the sidebar.")
@@ -0,0 +1,166 @@
+import hashlib
+import importlib.util
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from context_packer import WORD_PATTERN
+from settings import DEFAULT_CROSS_ENCODER, DEFAULT_LATENCY_BUDGET_MS
+
+
+# Function to check for optional cross-encoder support (pip install sentence-transformers)
+def cross_encoder_available() -> bool:
+    return importlib.util.find_spec("sentence_transformers") is not None
+
+
+# Function to turn a FAISS L2 distance into a similarity in (0, 1]
+def distance_to_similarity(distances: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + distances)
+
+
+# Function to rescale scores to the 0-1 range
+def min_max(scores: np.ndarray) -> np.ndarray:
+    spread = scores.max() - scores.min()
+    if spread == 0:
+        return np.ones_like(scores)
+    return (scores - scores.min()) / spread
+
+
+# Function to score all candidates against the query with BM25 in one pass
+def bm25_scores(query: str, texts: List[str], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    query_terms = list(dict.fromkeys(WORD_PATTERN.findall(query.lower())))
+    if not query_terms:
+        return np.zeros(len(texts))
+
+    # Term-frequency matrix restricted to the query terms: (documents x terms)
+    counts = [Counter(WORD_PATTERN.findall(text.lower())) for text in texts]
+    tf = np.array([[doc_counts[term] for term in query_terms] for doc_counts in counts], dtype=np.float32)
+    lengths = np.array([sum(doc_counts.values()) for doc_counts in counts], dtype=np.float32)
+
+    doc_freq = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(texts) - doc_freq + 0.5) / (doc_freq + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+class Reranker:
+    """
+    Rescore over-fetched FAISS hits on the CPU and return them best-first.
+    Scoring stops once the latency budget is spent; anything left unscored
+    keeps its vector-search order after the scored candidates. The budget
+    can also be given per call, so one reranker (and model) serves every budget.
+    """
+
+    def __init__(self, method: str = "lexical", model_name: str = DEFAULT_CROSS_ENCODER,
+                 latency_budget_ms: float = DEFAULT_LATENCY_BUDGET_MS, batch_size: int = 16,
+                 lexical_weight: float = 0.5, cache_size: int = 4096):
+        self.method = method
+        self.latency_budget_ms = latency_budget_ms
+        self.batch_size = batch_size
+        self.lexical_weight = lexical_weight
+        self.cache_size = cache_size
+        self.model = None
+        if method == "cross-encoder":
+            # Imported here so torch is only loaded when the cross-encoder is used
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(model_name, device="cpu")
+        self._cache: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Cached scores are keyed by the query and a hash of the chunk text
+    def _cache_key(self, query: str, text: str) -> Tuple[str, str]:
+        return query, hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _cache_put(self, key, score):
+        with self._lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # Lexical + vector-similarity blend, scored as one vectorized batch
+    # (BM25 statistics depend on the whole candidate set, so cache per set)
+    def _lexical_scores(self, query: str, texts: List[str], distances: np.ndarray) -> np.ndarray:
+        key = self._cache_key(query, "\0".join(texts))
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        lexical = min_max(bm25_scores(query, texts))
+        dense = min_max(distance_to_similarity(distances))
+        scores = self.lexical_weight * lexical + (1 - self.lexical_weight) * dense
+        self._cache_put(key, scores)
+        return scores
+
+    # Cross-encoder scores in batches, stopping when the budget runs out
+    def _cross_encoder_scores(self, query: str, texts: List[str], deadline: float) -> np.ndarray:
+        scores = np.full(len(texts), np.nan)
+        keys = [self._cache_key(query, text) for text in texts]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self._cache_get(key)
+            if cached is None:
+                pending.append(i)
+            else:
+                scores[i] = cached
+
+        for start in range(0, len(pending), self.batch_size):
+            if time.perf_counter() >= deadline:
+                break
+            batch = pending[start:start + self.batch_size]
+            batch_scores = self.model.predict([(query, texts[i]) for i in batch], batch_size=self.batch_size)
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self._cache_put(keys[i], float(score))
+        return scores
+
+    # Function to reorder candidates best-first, returning them with this call's stats
+    # (the reranker is shared by every session, so stats are never kept on it)
+    def rerank(self, query: str, docs_and_distances: List[Tuple[Document, float]],
+               latency_budget_ms: Optional[float] = None) -> Tuple[List[Document], Dict[str, float]]:
+        started = time.perf_counter()
+        deadline = started + (self.latency_budget_ms if latency_budget_ms is None else latency_budget_ms) / 1000.0
+        if not docs_and_distances:
+            return [], {"candidates": 0, "scored": 0, "elapsed_ms": 0.0}
+
+        docs = [doc for doc, _ in docs_and_distances]
+        texts = [doc.page_content for doc in docs]
+        distances = np.array([distance for _, distance in docs_and_distances], dtype=np.float32)
+
+        if self.method == "cross-encoder":
+            scores = self._cross_encoder_scores(query, texts, deadline)
+        else:
+            scores = self._lexical_scores(query, texts, distances)
+
+        # Scored candidates first (best-first), then the rest in vector order
+        scored = [i for i in range(len(docs)) if not math.isnan(scores[i])]
+        unscored = [i for i in range(len(docs)) if math.isnan(scores[i])]
+        order = sorted(scored, key=lambda i: -scores[i]) + unscored
+
+        stats = {
+            "candidates": len(docs),
+            "scored": len(scored),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        return [docs[i] for i in order], stats
+
+
+# Function to build a reranker from the sidebar choice, falling back to lexical scoring
+def make_reranker(choice: str, latency_budget_ms: float = DEFAULT_LATENCY_BUDGET_MS) -> Optional[Reranker]:
+    if choice == "Cross-encoder" and cross_encoder_available():
+        return Reranker(method="cross-encoder", latency_budget_ms=latency_budget_ms)
+    if choice in ("Cross-encoder", "Lexical (no download)"):
+        return Reranker(method="lexical", latency_budget_ms=latency_budget_ms)
+    return None
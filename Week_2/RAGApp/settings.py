@@ -0,0 +1,58 @@
+# Lightweight settings shared by the RAG app and its helpers.
+# Keep this module free of heavy imports: ragapp.py reads it before first paint.
+
+# Chunking settings
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+# Token-sized chunks used by the fast splitter (about the same size as above)
+CHUNK_TOKENS = 250
+CHUNK_OVERLAP_TOKENS = 25
+PAGE_BATCH_SIZE = 16
+
+# Background indexing: the first batch is small so the chat opens quickly,
+# and the progress display polls at this interval
+FIRST_PAGE_BATCH_SIZE = 2
+INDEX_POLL_S = 1.0
+
+# Embedding model used to build the shared document indexes
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Local CPU embeddings (no per-token cost, no network round-trip per query)
+EMBEDDING_BACKENDS = ["OpenAI", "Local (CPU)"]
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_EMBEDDING_BATCH_SIZE = 64
+# Precision the local vectors are stored at (int8 vectors are unit vectors scaled to -127..127)
+EMBEDDING_DTYPES = ["float32", "float16", "int8"]
+
+
+# Part of every document id, so indexes built with other settings are never reused
+def index_fingerprint(embedding_model: str = EMBEDDING_MODEL, dtype: str = "float32") -> str:
+    fingerprint = f"{embedding_model}:tok{CHUNK_TOKENS}:{CHUNK_OVERLAP_TOKENS}"
+    return fingerprint if dtype == "float32" else f"{fingerprint}:{dtype}"
+
+
+INDEX_FINGERPRINT = index_fingerprint()
+
+# Routed search over every shared document: each document's index is a shard
+# summarised by a few centroids, and a query only searches the nearest shards
+SHARD_ROUTE_K = 3
+CENTROIDS_PER_SHARD = 8
+SHARD_WORKERS = 4
+
+# Context packer settings
+DEFAULT_TOKEN_BUDGET = 1500
+DEFAULT_FETCH_K = 40
+DEFAULT_CANDIDATE_K = 12
+DEFAULT_BASELINE_K = 4
+DEFAULT_RERANK_FETCH_K = 50
+DUPLICATE_THRESHOLD = 0.8
+
+# Reranker settings
+RERANK_METHODS = ["None", "Lexical (no download)", "Cross-encoder"]
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_LATENCY_BUDGET_MS = 150
+
+# Speculative retrieval: reuse results for the raw question when the condensed
+# question overlaps it at least this much (word Jaccard)
+SPECULATION_THRESHOLD = 0.6
+CONDENSE_MODELS = ["gpt-4o", "gpt-4o-mini"]
@@ -0,0 +1,152 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+from settings import CENTROIDS_PER_SHARD, SHARD_ROUTE_K, SHARD_WORKERS
+
+# A shard gets one centroid per this many chunks (k-means needs about 40 points per centroid),
+# fitted on at most this many sampled vectors
+CHUNKS_PER_CENTROID = 40
+CENTROID_SAMPLE = 4096
+KMEANS_ITERATIONS = 10
+
+# Shard searches run here (FAISS releases the GIL while it searches)
+_executor = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard-search")
+
+
+# Function to summarise a shard's vectors with a few k-means centroids
+def compute_centroids(index, max_centroids: int = CENTROIDS_PER_SHARD) -> np.ndarray:
+    count = index.ntotal
+    sample = np.linspace(0, count - 1, min(count, CENTROID_SAMPLE)).astype(np.int64)
+    vectors = np.vstack([index.reconstruct(int(i)) for i in sample]).astype(np.float32)
+    centroids = max(1, min(max_centroids, count // CHUNKS_PER_CENTROID))
+    if centroids == 1:
+        return vectors.mean(axis=0, keepdims=True)
+    kmeans = faiss.Kmeans(vectors.shape[1], centroids, niter=KMEANS_ITERATIONS, seed=0)
+    kmeans.train(vectors)
+    return kmeans.centroids
+
+
+class ShardedIndex:
+    """
+    Vector-store stand-in that spreads a search over many library documents
+    (one FAISS index each) but only touches the relevant ones. A small
+    routing index holds a few centroids per shard. Each query is sent to
+    the ``route_k`` shards with the nearest centroids, those shards are
+    searched in parallel, and the hits are merged by distance. It offers
+    the search methods ``PackedRetriever`` uses, so the chain is unchanged.
+
+    Centroids are cached next to each index in the library, so opening a
+    collection never loads every shard. One instance is shared by every
+    session, so routing stats are kept per thread: ``route_stats()`` describes
+    the calling thread's last search.
+    """
+
+    def __init__(self, library, doc_ids: List[str], route_k: int = SHARD_ROUTE_K):
+        self.library = library
+        self.route_k = route_k
+        self.doc_ids: List[str] = []
+        self.router = None
+        self.owners = np.zeros(0, dtype=np.int64)  # routing row -> shard number
+        self._lock = threading.Lock()
+        self._calls = threading.local()
+        self.set_shards(doc_ids)
+
+    # Function to load (or compute and cache) the centroids of one shard
+    def _centroids(self, doc_id: str) -> np.ndarray:
+        path = self.library.artifact_path(doc_id, "centroids.npy")
+        if path.exists():
+            return np.load(path)
+        centroids = compute_centroids(self.library.get(doc_id).index)
+        staging = path.with_name(f".{path.name}.{threading.get_ident()}")
+        with open(staging, "wb") as f:
+            np.save(f, centroids)
+        staging.replace(path)
+        return centroids
+
+    # Function to (re)build the routing index when the set of shards changes
+    def set_shards(self, doc_ids: List[str]):
+        if list(doc_ids) == self.doc_ids:
+            return
+        centroids = [self._centroids(doc_id) for doc_id in doc_ids]
+        router = None
+        if centroids:
+            router = faiss.IndexFlatL2(centroids[0].shape[1])
+            router.add(np.vstack(centroids).astype(np.float32))
+        owners = np.concatenate([np.full(len(c), shard) for shard, c in enumerate(centroids)]) if centroids else np.zeros(0)
+        with self._lock:
+            self.doc_ids, self.router, self.owners = list(doc_ids), router, owners.astype(np.int64)
+
+    # Function to pick the shards whose centroids are nearest the query
+    def route(self, query: np.ndarray) -> List[str]:
+        with self._lock:
+            doc_ids, router, owners = self.doc_ids, self.router, self.owners
+        if router is None:
+            return []
+        _, rows = router.search(query, min(router.ntotal, self.route_k * CENTROIDS_PER_SHARD))
+        shards = list(dict.fromkeys(int(owners[row]) for row in rows[0] if row >= 0))[:self.route_k]
+        return [doc_ids[shard] for shard in shards]
+
+    # Function to search one shard, returning (distance, document, vector) hits
+    def _search_shard(self, doc_id: str, query: np.ndarray, k: int, with_vectors: bool):
+        vectorstore = self.library.get(doc_id)
+        if vectorstore is None:
+            return []  # Removed from the library since routing
+        distances, rows = vectorstore.index.search(query, k)
+        hits = []
+        for distance, row in zip(distances[0], rows[0]):
+            if row == -1:
+                continue
+            document = vectorstore.docstore.search(vectorstore.index_to_docstore_id[row])
+            vector = vectorstore.index.reconstruct(int(row)) if with_vectors else None
+            hits.append((float(distance), document, vector))
+        return hits
+
+    # Function to query the routed shards in parallel and merge their hits, nearest first
+    def _search(self, embedding: List[float], k: int, with_vectors: bool = False) -> List[Tuple[float, Document, Optional[np.ndarray]]]:
+        started = time.perf_counter()
+        query = np.array([embedding], dtype=np.float32)
+        shards = self.route(query)
+        futures = [_executor.submit(self._search_shard, doc_id, query, k, with_vectors) for doc_id in shards]
+        hits = sorted((hit for future in futures for hit in future.result()), key=lambda hit: hit[0])[:k]
+        self._calls.route = {
+            "shards": len(self.doc_ids),
+            "searched": len(shards),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        return hits
+
+    # Function to report how the calling thread's last search was routed
+    def route_stats(self) -> Dict[str, object]:
+        return getattr(self._calls, "route", {})
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        return [(document, distance) for distance, document, _ in self._search(embedding, k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [document for distance, document, _ in self._search(embedding, k)]
+
+    # Function to run MMR over the merged hits, also returning that pool nearest first
+    def mmr_search_with_pool(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                             lambda_mult: float = 0.5) -> Tuple[List[Document], List[Document]]:
+        hits = self._search(embedding, fetch_k, with_vectors=True)
+        if not hits:
+            return [], []
+        selected = maximal_marginal_relevance(
+            np.array([embedding], dtype=np.float32), [vector for _, _, vector in hits], k=k, lambda_mult=lambda_mult
+        )
+        return [hits[i][1] for i in selected], [document for _, document, _ in hits]
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, **kwargs) -> List[Document]:
+        return self.mmr_search_with_pool(embedding, k, fetch_k, lambda_mult)[0]
+
+    # Copies of a session's chain share the same sharded index
+    def __deepcopy__(self, memo):
+        return self
@@ -0,0 +1,98 @@
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+from langchain.callbacks.manager import CallbackManagerForChainRun
+from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+from pydantic import Field
+
+from context_packer import word_overlap
+from settings import SPECULATION_THRESHOLD
+
+# Speculative retrievals run here while the condense call is in flight
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-retrieval")
+
+
+# Function to normalise a question for comparison
+def normalize_question(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower().rstrip("?!. "))
+
+
+class SpeculativeRetrievalChain(ConversationalRetrievalChain):
+    """
+    Conversational retrieval chain that retrieves for the raw question while
+    the LLM is still condensing it with the chat history. If the condensed
+    question turns out close enough to the raw one, the speculative results
+    are used and the retrieval round trip is off the critical path; otherwise
+    they are discarded and retrieval runs again on the condensed question.
+
+    With no chat history, condensing is skipped entirely (as in the parent).
+    """
+
+    speculate: bool = True
+    similarity_threshold: float = SPECULATION_THRESHOLD
+    speculation_stats: Dict[str, int] = Field(default_factory=lambda: {"hits": 0, "misses": 0, "skipped": 0})
+    last_speculation: Optional[str] = None
+
+    # Function to decide whether results for the raw question can stand in for the condensed one
+    def _close_enough(self, question: str, new_question: str) -> bool:
+        if normalize_question(question) == normalize_question(new_question):
+            return True
+        return word_overlap(question, new_question) >= self.similarity_threshold
+
+    def _call(self, inputs: Dict[str, Any], run_manager: Optional[CallbackManagerForChainRun] = None) -> Dict[str, Any]:
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        question = inputs["question"]
+        get_chat_history = self.get_chat_history or _get_chat_history
+        chat_history_str = get_chat_history(inputs["chat_history"])
+
+        if not chat_history_str:
+            # First turn: nothing to condense, retrieve straight away
+            new_question = question
+            docs = self._get_docs(question, inputs, run_manager=_run_manager)
+            self.last_speculation = "skipped"
+        elif not self.speculate:
+            self.last_speculation = None
+            return super()._call(inputs, run_manager)
+        else:
+            speculative = _executor.submit(self._get_docs, question, inputs, run_manager=_run_manager)
+            new_question = self.question_generator.run(
+                question=question,
+                chat_history=chat_history_str,
+                callbacks=_run_manager.get_child(),
+            )
+            if self._close_enough(question, new_question):
+                docs = speculative.result()
+                self.last_speculation = "hits"
+            else:
+                # Discard the speculative results; let the call settle first so it
+                # can't overwrite the retriever's stats (it is usually done by now)
+                wait([speculative])
+                docs = self._get_docs(new_question, inputs, run_manager=_run_manager)
+                self.last_speculation = "misses"
+        self.speculation_stats[self.last_speculation] += 1
+
+        output: Dict[str, Any] = {}
+        if self.response_if_no_docs_found is not None and len(docs) == 0:
+            output[self.output_key] = self.response_if_no_docs_found
+        else:
+            new_inputs = inputs.copy()
+            if self.rephrase_question:
+                new_inputs["question"] = new_question
+            new_inputs["chat_history"] = chat_history_str
+            output[self.output_key] = self.combine_docs_chain.run(
+                input_documents=docs,
+                callbacks=_run_manager.get_child(),
+                **new_inputs,
+            )
+        if self.return_source_documents:
+            output["source_documents"] = docs
+        if self.return_generated_question:
+            output["generated_question"] = new_question
+        return output
+
+    # Function to report how often the speculative retrieval was reused
+    def hit_rate(self) -> float:
+        attempts = self.speculation_stats["hits"] + self.speculation_stats["misses"]
+        return self.speculation_stats["hits"] / attempts if attempts else 0.0
@@ -0,0 +1,150 @@
+"""
+Local embedding benchmark for RAGApp.
+
+Measures single-query latency (p50/p99) and batch ingest throughput of
+``LocalEmbeddings`` at each output precision, and how many bytes a vector
+takes in the FAISS index built for it.
+
+``--tiny`` swaps the real model for a tiny randomly initialised BERT with a
+throwaway vocabulary, so the benchmark (and the code path) can be checked
+offline without downloading anything; its timings say nothing about the
+real model.
+
+Every run also checks the vectors and exits non-zero if a check fails:
+output shape and dtype, unit length, closeness to the float32 vectors, an
+exact index round-trip (``reconstruct_n``), each chunk finding itself, and
+top-1 hits that are as good as float32's up to quantization error. A random
+model scores most chunks almost equally, so reduced-precision indexes may
+pick a different but equally close chunk; the check compares similarities
+rather than requiring the same chunk.
+
+    python benchmarks/embedding_latency.py                # the configured MiniLM model
+    python benchmarks/embedding_latency.py --tiny --chunks 500
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+RAG_DIR = BENCH_DIR.parent / "Week_2" / "RAGApp"
+sys.path.insert(0, str(RAG_DIR))
+
+import numpy as np  # noqa: E402
+
+from local_embeddings import INT8_SCALE, LocalEmbeddings, make_index  # noqa: E402
+from settings import EMBEDDING_DTYPES, LOCAL_EMBEDDING_BATCH_SIZE  # noqa: E402
+
+# Allowed deviation from unit length, and minimum cosine similarity to the float32 vectors
+NORM_TOLERANCE = {"float32": 1e-5, "float16": 1e-3, "int8": 0.02}
+MIN_COSINE = {"float32": 0.99999, "float16": 0.9999, "int8": 0.999}
+# How much less similar (cosine) a top-1 hit may be than the float32 top-1 hit
+TOP1_SIMILARITY_TOLERANCE = 0.01
+
+VOCABULARY = (
+    "the employee handbook describes onboarding steps benefits leave policy payroll manager "
+    "review quarterly security training laptop access badge office remote expenses travel "
+    "approval form deadline contact team department schedule holiday insurance pension"
+).split()
+
+
+# Function to build a tiny random BERT and a word-level tokenizer for offline runs
+def tiny_model():
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    words = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *dict.fromkeys(VOCABULARY), "?", "."]
+    tokenizer = BertTokenizerFast(vocab={word: i for i, word in enumerate(words)})
+    config = BertConfig(vocab_size=tokenizer.vocab_size, hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=2, intermediate_size=64, max_position_embeddings=512)
+    return BertModel(config), tokenizer
+
+
+# Function to make chunk-sized texts and short questions from the vocabulary
+def synthetic_texts(count: int, words: int, seed: int):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(words)) for _ in range(count)]
+
+
+# Function to check one precision's vectors and index, returning a list of failures
+def check_vectors(dtype: str, vectors: np.ndarray, count: int, dimension: int, index,
+                  reference: np.ndarray, query_vectors: np.ndarray, top: np.ndarray):
+    failures = []
+    if vectors.shape != (count, dimension) or vectors.dtype != np.dtype(dtype):
+        return [f"encode() returned {vectors.dtype} {vectors.shape}, expected {dtype} {(count, dimension)}"]
+    decoded = vectors.astype(np.float32) / (INT8_SCALE if dtype == "int8" else 1.0)
+    norms = np.linalg.norm(decoded, axis=1)
+    if np.abs(norms - 1).max() > NORM_TOLERANCE[dtype]:
+        failures.append(f"vectors are not unit length (off by up to {np.abs(norms - 1).max():.4f})")
+    cosine = (decoded * reference).sum(axis=1) / norms
+    if cosine.min() < MIN_COSINE[dtype]:
+        failures.append(f"vectors drift from float32 (cosine down to {cosine.min():.5f})")
+    if not np.array_equal(index.reconstruct_n(0, index.ntotal), vectors.astype(np.float32)):
+        failures.append("index does not store the vectors exactly (reconstruct_n differs)")
+    distances, _ = index.search(vectors[:min(count, 100)].astype(np.float32), 1)
+    if distances.max() > 1e-6:
+        failures.append("a chunk's own vector is not its nearest neighbour")
+    similarities = query_vectors @ reference.T
+    loss = similarities.max(axis=1) - similarities[np.arange(len(top)), top[:, 0]]
+    if loss.max() > TOP1_SIMILARITY_TOLERANCE:
+        failures.append(f"top-1 hits are worse than float32's (cosine lower by up to {loss.max():.4f})")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiny", action="store_true", help="use a tiny random model (offline)")
+    parser.add_argument("--chunks", type=int, default=2000, help="chunks embedded for the ingest measurement")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=LOCAL_EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, help="torch threads (default: all cores)")
+    args = parser.parse_args()
+
+    model, tokenizer = tiny_model() if args.tiny else (None, None)
+    chunks = synthetic_texts(args.chunks, 180, seed=0)
+    queries = synthetic_texts(args.queries, 12, seed=1)
+
+    print(f"{'dtype':>8} {'query p50 ms':>13} {'query p99 ms':>13} {'chunks/s':>9} {'bytes/vector':>13} {'top-1 agree':>12}  check")
+    reference = reference_vectors = reference_queries = None
+    failed = False
+    for dtype in EMBEDDING_DTYPES:
+        embeddings = LocalEmbeddings(batch_size=args.batch_size, output_dtype=dtype, num_threads=args.threads,
+                                     model=model, tokenizer=tokenizer)
+        embeddings.embed_query(queries[0])  # First call pays one-off allocation costs
+
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+
+        started = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+        throughput = len(chunks) / (time.perf_counter() - started)
+
+        # Search quality against float32: how often the best chunk for a query is unchanged
+        index = make_index(embeddings.dimension, dtype)
+        index.add(vectors)
+        query_vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+        _, top = index.search(query_vectors, 1)
+        if reference is None:
+            reference, reference_vectors, reference_queries = top, vectors, query_vectors
+        agree = float((top == reference).mean())
+
+        # embed_documents() returns floats; encode() shows the precision the vectors come out at
+        native = vectors.astype(embeddings.encode(queries[:1]).dtype)
+        failures = check_vectors(dtype, native, len(chunks), embeddings.dimension, index,
+                                 reference_vectors, reference_queries, top)
+        failed |= bool(failures)
+        print(f"{dtype:>8} {statistics.median(latencies):>13.2f} {latencies[int(0.99 * (len(latencies) - 1))]:>13.2f} "
+              f"{throughput:>9.0f} {index.sa_code_size():>13} {agree:>12.0%}  {'FAIL' if failures else 'ok'}")
+        for failure in failures:
+            print(f"    {failure}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
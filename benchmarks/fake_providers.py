@@ -0,0 +1,200 @@
+"""
+Local fake model providers for load testing the Streamlit apps offline.
+
+Starts a threaded HTTP server that speaks just enough of the OpenAI
+(chat completions, embeddings) and Hugging Face Inference APIs for the
+apps, with a configurable per-request latency standing in for network
+and model time. Gemini is faked with a LangChain chat model because the
+Google SDK does not talk plain HTTP.
+"""
+
+import hashlib
+import io
+import json
+import random
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+
+HF_API_PREFIX = "https://api-inference.huggingface.co"
+EMBEDDING_SIZE = 256
+
+FAKE_ANSWERS = [
+    "The document explains the onboarding process in three short steps.",
+    "Mia and Leo discover a hidden garden where the flowers can sing. Together they must find the missing melody before winter comes!",
+    "That's a great question. In short, it depends on the context you give me.",
+]
+
+# Simulated provider latency in seconds (set by fake_providers())
+LATENCY_S = 0.2
+
+
+# Function to make a deterministic embedding for a piece of text
+def fake_embedding(text: Any) -> List[float]:
+    seed = int(hashlib.md5(json.dumps(text).encode("utf-8")).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_SIZE)]
+
+
+# Function to render a small PNG to stand in for a generated image
+def fake_png() -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (120, 180, 220)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep the benchmark output clean
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload: Any):
+        self._send(200, json.dumps(payload).encode("utf-8"))
+
+    def _send_stream(self, text: str, model: str, n: int = 1):
+        # Server-sent events, one word per chunk (interleaved across the n choices)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in text.split(" "):
+            for index in range(n):
+                chunk = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": index, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(LATENCY_S)
+
+        if self.path.endswith("/embeddings"):
+            inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            self._send_json({
+                "object": "list", "model": request.get("model", "fake"),
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text)} for i, text in enumerate(inputs)],
+                "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+            })
+        elif self.path.endswith("/chat/completions"):
+            model = request.get("model", "fake")
+            answer = random.choice(FAKE_ANSWERS)
+            if request.get("stream"):
+                self._send_stream(answer, model, request.get("n", 1))
+                return
+            self._send_json({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [
+                    {"index": i, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}
+                    for i in range(request.get("n", 1))
+                ],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 40, "total_tokens": 140},
+            })
+        elif self.path.startswith("/models/"):
+            parameters = request.get("parameters", {})
+            if "num_inference_steps" in parameters or "guidance_scale" in parameters:
+                self._send(200, self.server.png, "image/png")
+            else:
+                self._send_json([{"generated_text": random.choice(FAKE_ANSWERS)}])
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+
+# Function to build a LangChain chat model class that stands in for Gemini
+def fake_gemini_class():
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from pydantic import ConfigDict
+
+    class FakeGeminiChat(BaseChatModel):
+        model_config = ConfigDict(extra="allow")
+
+        @property
+        def _llm_type(self) -> str:
+            return "fake-gemini"
+
+        def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+            time.sleep(LATENCY_S)
+            message = AIMessage(content=random.choice(FAKE_ANSWERS))
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    return FakeGeminiChat
+
+
+@contextmanager
+def fake_providers(latency_s: float = 0.2):
+    """
+    Run the fake providers and point the apps' SDKs at them for the
+    duration of the block.
+    """
+    global LATENCY_S
+    LATENCY_S = latency_s
+
+    import os
+    import requests
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeProviderHandler)
+    server.daemon_threads = True
+    server.png = fake_png()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    saved_env = {key: os.environ.get(key) for key in ("OPENAI_BASE_URL", "OPENAI_API_BASE", "OPENAI_API_KEY", "HF_TOKEN")}
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "OPENAI_API_BASE": f"{base_url}/v1",
+        "OPENAI_API_KEY": "sk-fake",
+        "HF_TOKEN": "hf_fake",
+    })
+
+    # Send Hugging Face Inference API calls to the local server (requests.post and shared sessions alike)
+    real_request = requests.Session.request
+
+    def local_request(self, method, url, *args, **kwargs):
+        if url.startswith(HF_API_PREFIX):
+            url = base_url + url[len(HF_API_PREFIX):]
+        return real_request(self, method, url, *args, **kwargs)
+
+    requests.Session.request = local_request
+
+    # Swap the Gemini chat model for the fake one
+    saved_gemini_module = sys.modules.get("langchain_google_genai")
+    gemini_module = types.ModuleType("langchain_google_genai")
+    gemini_module.ChatGoogleGenerativeAI = fake_gemini_class()
+    sys.modules["langchain_google_genai"] = gemini_module
+
+    try:
+        yield base_url
+    finally:
+        requests.Session.request = real_request
+        if saved_gemini_module is not None:
+            sys.modules["langchain_google_genai"] = saved_gemini_module
+        else:
+            sys.modules.pop("langchain_google_genai", None)
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        server.shutdown()
+        server.server_close()
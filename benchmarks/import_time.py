@@ -0,0 +1,96 @@
+"""
+Cold-start import benchmark for the Streamlit apps.
+
+Runs each app's module-level imports in a fresh interpreter with
+``python -X importtime`` and fails if the total import time exceeds the
+first-paint budget or regresses against the recorded baseline.
+
+    python benchmarks/import_time.py            # check against the baseline
+    python benchmarks/import_time.py --update   # record a new baseline
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUDGET_FILE = Path(__file__).resolve().parent / "import_budget.json"
+
+# Apps whose cold start is tracked
+APPS = [
+    "Week_2/RAGApp/ragapp.py",
+    "Week_2/LangChainChatbot/langchainapp.py",
+]
+
+
+# Function to pull the module-level import statements out of a script
+def top_level_imports(script: Path) -> str:
+    tree = ast.parse(script.read_text(encoding="utf-8"))
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in imports)
+
+
+# Function to sum the cumulative time of the top-level imports in -X importtime output
+def parse_importtime(stderr: str) -> float:
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level
+        if len(name) - len(name.lstrip()) == 1:
+            total_us += int(cumulative)
+    return total_us / 1000.0
+
+
+# Function to measure one app's import time (median of several cold runs)
+def measure(app: str, runs: int) -> float:
+    script = REPO_ROOT / app
+    code = top_level_imports(script)
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=script.parent, capture_output=True, text=True,
+            # The apps put the repo root on sys.path for the shared common/ package
+            env={**os.environ, "PYTHONPATH": str(REPO_ROOT)},
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {app} failed:\n{result.stderr.strip().splitlines()[-1]}")
+        samples.append(parse_importtime(result.stderr))
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="record the current timings as the new baseline")
+    parser.add_argument("--runs", type=int, default=5, help="cold runs per app (the median is used)")
+    args = parser.parse_args()
+
+    budget = json.loads(BUDGET_FILE.read_text())
+    failed = False
+    for app in APPS:
+        ms = measure(app, args.runs)
+        baseline = budget["baseline_ms"].get(app)
+        limit = budget["max_ms"]
+        if baseline is not None and not args.update:
+            limit = min(limit, baseline * (1 + budget["tolerance"]))
+        status = "ok" if ms <= limit else "REGRESSED"
+        failed |= ms > limit
+        print(f"{app:45s} {ms:8.1f} ms  (limit {limit:.1f} ms)  {status}")
+        if args.update:
+            budget["baseline_ms"][app] = round(ms, 1)
+
+    if args.update:
+        BUDGET_FILE.write_text(json.dumps(budget, indent=2) + "\n")
+        print(f"Baseline written to {BUDGET_FILE.relative_to(REPO_ROOT)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Concurrent-session load test for the Streamlit apps.
+
+Drives N simultaneous sessions of an app with ``streamlit.testing.v1.AppTest``,
+each running a scripted conversation against the local fake providers in
+``fake_providers.py``. Every concurrency level runs in a fresh worker process
+and reports rerun throughput, p50/p99 rerun latency and peak RSS per session.
+The saturation point is the last level where adding sessions still raised
+throughput by at least 10%.
+
+Results are appended to ``benchmarks/results/loadtest.jsonl`` (tagged with
+the git commit) and compared with the previous run of the same app.
+
+    python benchmarks/loadtest.py --app ragapp --sessions 1 2 4 8 16
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+RESULTS_FILE = BENCH_DIR / "results" / "loadtest.jsonl"
+RAG_DIR = REPO_ROOT / "Week_2" / "RAGApp"
+
+RUN_TIMEOUT_S = 120
+SATURATION_GAIN = 1.10
+
+SAMPLE_DOCUMENT = "\n\n".join(
+    f"Section {i}. New employees complete step {i % 3 + 1} of onboarding by meeting their buddy, "
+    f"reading the handbook chapter {i} and filing the form HR-{100 + i}."
+    for i in range(200)
+)
+
+
+@dataclass
+class Scenario:
+    path: str
+    steps: List[Callable]
+
+
+# Function to find a widget by part of its label
+def find(widgets, label: str):
+    return next(widget for widget in widgets if label in widget.label)
+
+
+# Function to bundle a sample document the RAG app imports at warm-up (AppTest cannot upload files)
+def prepare_rag_bundle() -> str:
+    sys.path.insert(0, str(RAG_DIR))
+    from langchain.schema import Document
+    from langchain_community.vectorstores import FAISS
+    from langchain_openai import OpenAIEmbeddings
+    from doc_library import DEFAULT_BUNDLE_DIR, DocumentLibrary
+    from settings import EMBEDDING_MODEL, index_fingerprint
+
+    bundles = DocumentLibrary(root_dir=DEFAULT_BUNDLE_DIR)
+    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL, check_embedding_ctx_length=False)
+    chunks = [
+        Document(page_content=text, metadata={"source": "handbook.txt", "page": 0})
+        for text in SAMPLE_DOCUMENT.split("\n\n")
+    ]
+    bundles.get_or_build("loadtest-handbook", "handbook.txt", lambda: FAISS.from_documents(chunks, embeddings), index_fingerprint())
+    return "loadtest-handbook"
+
+
+def rag_scenario() -> Scenario:
+    doc_id = prepare_rag_bundle()
+    questions = ["What are the onboarding steps?", "Which form do I file?", "Who is my buddy?"]
+    return Scenario("Week_2/RAGApp/ragapp.py", [
+        lambda at: find(at.sidebar.text_input, "OpenAI API Key").input("sk-fake"),
+        lambda at: find(at.sidebar.selectbox, "bundled document").select(doc_id),
+        *[lambda at, q=q: at.chat_input[0].set_value(q) for q in questions],
+    ])
+
+
+def langchain_scenario() -> Scenario:
+    messages = ["Hi there!", "Can you suggest a book?", "Why that one?"]
+    return Scenario("Week_2/LangChainChatbot/langchainapp.py", [
+        lambda at: at.text_input(key="gemini_key").input("fake"),
+        *[lambda at, m=m: at.text_input(key="user_input").input(m) for m in messages],
+        lambda at: at.text_input(key="openai_key").input("sk-fake"),
+        lambda at: at.button(key="end_chat").click(),
+    ])
+
+
+def hfimage_scenario() -> Scenario:
+    return Scenario("Week_2/HFImageApp/hfimage.py", [
+        lambda at: at.text_area[0].input("Mia, 7\nLeo, 9"),
+        lambda at: find(at.text_input, "Book Title").input("The Singing Garden"),
+        lambda at: find(at.button, "Generate Blurb").click(),
+        lambda at: find(at.button, "Generate Blurb").click(),
+    ])
+
+
+SCENARIOS = {
+    "ragapp": rag_scenario,
+    "langchainapp": langchain_scenario,
+    "hfimage": hfimage_scenario,
+}
+
+
+# Function to read the process's current resident set size in MB
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Function to drive one session through its scripted conversation
+def run_session(scenario: Scenario, latencies: List[float], errors: List[str], start: threading.Barrier):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(REPO_ROOT / scenario.path), default_timeout=RUN_TIMEOUT_S)
+    start.wait()
+    try:
+        for step in [None] + scenario.steps:
+            if step is not None:
+                step(at)
+            began = time.perf_counter()
+            at.run()
+            latencies.append(time.perf_counter() - began)
+            if at.exception:
+                errors.append(at.exception[0].message)
+                return
+    except Exception as e:
+        errors.append(repr(e))
+
+
+# Function to run one concurrency level in this process (used by --worker)
+def run_level(app: str, sessions: int, latency_s: float) -> Dict[str, float]:
+    from fake_providers import fake_providers
+
+    os.environ["RAG_LIBRARY_DIR"] = tempfile.mkdtemp(prefix="loadtest-library-")
+    os.environ["RAG_BUNDLE_DIR"] = tempfile.mkdtemp(prefix="loadtest-bundles-")
+    with fake_providers(latency_s):
+        scenario = SCENARIOS[app]()
+        latencies: List[float] = []
+        errors: List[str] = []
+        start = threading.Barrier(sessions + 1)
+        threads = [
+            threading.Thread(target=run_session, args=(scenario, latencies, errors, start), daemon=True)
+            for _ in range(sessions)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Sample RSS while the sessions run
+        baseline_rss = current_rss_mb()
+        peak_rss = baseline_rss
+        start.wait()
+        began = time.perf_counter()
+        while any(thread.is_alive() for thread in threads):
+            peak_rss = max(peak_rss, current_rss_mb())
+            time.sleep(0.05)
+        wall = time.perf_counter() - began
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else "",
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(quantiles[49] * 1000, 1),
+        "p99_ms": round(quantiles[98] * 1000, 1),
+        "rss_per_session_mb": round((peak_rss - baseline_rss) / sessions, 1),
+    }
+
+
+# Function to find the last level where more sessions still meant more throughput
+def saturation_point(levels: List[Dict[str, float]]) -> int:
+    saturated = levels[0]["sessions"]
+    for previous, level in zip(levels, levels[1:]):
+        if level["throughput_rps"] < previous["throughput_rps"] * SATURATION_GAIN:
+            break
+        saturated = level["sessions"]
+    return saturated
+
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+
+# Function to load the previous result for the same app and settings
+def previous_result(app: str, latency_ms: float):
+    if not RESULTS_FILE.exists():
+        return None
+    matches = [
+        record for record in map(json.loads, RESULTS_FILE.read_text().splitlines())
+        if record["app"] == app and record["latency_ms"] == latency_ms
+    ]
+    return matches[-1] if matches else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=sorted(SCENARIOS), default="ragapp")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--latency-ms", type=float, default=200, help="simulated provider latency per request")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="fail if peak throughput drops by more than this fraction")
+    parser.add_argument("--no-save", action="store_true", help="don't append the results to the results file")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_level(args.app, args.worker, args.latency_ms / 1000)))
+        return 0
+
+    # Each level runs in a fresh process so caches and RSS start cold
+    levels = []
+    print(f"{'sessions':>8} {'reruns':>7} {'rps':>8} {'p50 ms':>9} {'p99 ms':>9} {'MB/sess':>8} {'errors':>7}")
+    for sessions in args.sessions:
+        result = subprocess.run(
+            [sys.executable, __file__, "--app", args.app, "--latency-ms", str(args.latency_ms), "--worker", str(sessions)],
+            cwd=BENCH_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            return 2
+        level = json.loads(result.stdout.strip().splitlines()[-1])
+        levels.append(level)
+        print(f"{level['sessions']:>8} {level['reruns']:>7} {level['throughput_rps']:>8} {level['p50_ms']:>9} "
+              f"{level['p99_ms']:>9} {level['rss_per_session_mb']:>8} {level['errors']:>7}")
+        if level["first_error"]:
+            print(f"         first error: {level['first_error']}")
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "app": args.app,
+        "latency_ms": args.latency_ms,
+        "saturation_sessions": saturation_point(levels),
+        "peak_throughput_rps": max(level["throughput_rps"] for level in levels),
+        "levels": levels,
+    }
+    print(f"Saturation at {record['saturation_sessions']} sessions, peak {record['peak_throughput_rps']} reruns/s")
+
+    failed = False
+    previous = previous_result(args.app, args.latency_ms)
+    if previous is not None:
+        change = record["peak_throughput_rps"] / previous["peak_throughput_rps"] - 1
+        print(f"Peak throughput {change:+.0%} vs. {previous['commit']} "
+              f"(saturation {previous['saturation_sessions']} -> {record['saturation_sessions']} sessions)")
+        failed = change < -args.max_regression
+
+    if not args.no_save:
+        RESULTS_FILE.parent.mkdir(exist_ok=True)
+        with open(RESULTS_FILE, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Routed (sharded) search benchmark for RAGApp.
+
+Builds a library of synthetic documents, one FAISS index each, whose
+chunk vectors sit around a few per-document topics, then compares
+searching one monolithic index over the whole corpus with
+``ShardedIndex`` routing each query to its nearest shards. It reports
+the query latency, the chunks scanned per query, and how many of the
+monolithic top-k the routed search finds.
+
+No embedding model or API key is needed. The vectors are random, so
+recall depends on how cleanly the synthetic topics separate, not on any
+real model.
+
+    python benchmarks/sharded_search.py
+    python benchmarks/sharded_search.py --documents 200 --chunks 400 --route-k 2 4 8
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+RAG_DIR = BENCH_DIR.parent / "Week_2" / "RAGApp"
+sys.path.insert(0, str(RAG_DIR))
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+
+from doc_library import DocumentLibrary, VectorSearchOnly  # noqa: E402
+from sharded_index import ShardedIndex  # noqa: E402
+
+TOPICS_PER_DOCUMENT = 3
+TOPIC_SPREAD = 0.35
+
+
+# Function to draw unit vectors scattered around a few random topic directions
+def topical_vectors(rng, count: int, dimension: int, topics: int) -> np.ndarray:
+    centres = rng.standard_normal((topics, dimension))
+    vectors = centres[rng.integers(0, topics, count)] + TOPIC_SPREAD * rng.standard_normal((count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+# Function to time a search function over the queries, returning (p50 ms, results)
+def timed(search, queries):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies), results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100, help="documents (shards) in the library")
+    parser.add_argument("--chunks", type=int, default=300, help="chunks per document")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10, help="hits per query")
+    parser.add_argument("--route-k", type=int, nargs="+", default=[1, 3, 8], help="shards searched per query")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    library = DocumentLibrary(root_dir=tempfile.mkdtemp(prefix="sharded-bench-"))
+    doc_ids, corpus = [], []
+    for number in range(args.documents):
+        vectors = topical_vectors(rng, args.chunks, args.dimension, TOPICS_PER_DOCUMENT)
+        texts = [f"doc{number}-chunk{i}" for i in range(args.chunks)]
+        doc_id = f"doc{number:05d}"
+        library.get_or_build(doc_id, doc_id, lambda: FAISS.from_embeddings(
+            list(zip(texts, vectors.tolist())), VectorSearchOnly(), metadatas=[{"doc": doc_id}] * args.chunks))
+        doc_ids.append(doc_id)
+        corpus.append((texts, vectors))
+
+    monolith = faiss.IndexFlatL2(args.dimension)
+    monolith.add(np.vstack([vectors for _, vectors in corpus]))
+    texts = [text for chunk_texts, _ in corpus for text in chunk_texts]
+
+    # Queries are perturbed chunks, so each has a true home document
+    picks = rng.integers(0, monolith.ntotal, args.queries)
+    queries = np.vstack([monolith.reconstruct(int(i)) for i in picks])
+    queries += 0.5 * TOPIC_SPREAD * rng.standard_normal(queries.shape).astype(np.float32)
+
+    monolith_ms, exact = timed(lambda q: [texts[i] for i in monolith.search(q[None, :], args.k)[1][0]], queries)
+    print(f"{args.documents} documents x {args.chunks} chunks = {monolith.ntotal} vectors, k={args.k}")
+    print(f"{'search':>16} {'p50 ms':>8} {'chunks scanned':>15} {'recall@k':>9}")
+    print(f"{'monolithic':>16} {monolith_ms:>8.2f} {monolith.ntotal:>15} {1:>9.0%}")
+
+    started = time.perf_counter()
+    sharded = ShardedIndex(library, doc_ids)
+    print(f"(routing index: {sharded.router.ntotal} centroids, built in {time.perf_counter() - started:.1f}s)")
+    for route_k in args.route_k:
+        sharded.route_k = route_k
+        routed_ms, routed = timed(
+            lambda q: [doc.page_content for doc in sharded.similarity_search_by_vector(q.tolist(), k=args.k)], queries)
+        recall = statistics.mean(len(set(hits) & set(truth)) / args.k for hits, truth in zip(routed, exact))
+        print(f"{f'routed top-{route_k}':>16} {routed_ms:>8.2f} {route_k * args.chunks:>15} {recall:>9.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
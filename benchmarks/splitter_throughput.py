@@ -0,0 +1,99 @@
+"""
+Splitter throughput benchmark for RAGApp ingestion.
+
+Splits a synthetic multi-page corpus with three splitters and reports
+throughput (MB/s), chunk count and chunk size in tokens:
+
+- ``chars``: ``RecursiveCharacterTextSplitter`` sized in characters (the old default)
+- ``tiktoken``: the same splitter sized in tokens via ``from_tiktoken_encoder``
+- ``fast``: RAGApp's ``FastTokenSplitter``
+
+Needs the tiktoken encodings (downloaded on first use, then cached).
+
+    python benchmarks/splitter_throughput.py --pages 400 --runs 3
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+RAG_DIR = BENCH_DIR.parent / "Week_2" / "RAGApp"
+sys.path.insert(0, str(RAG_DIR))
+
+from langchain.schema import Document  # noqa: E402
+from langchain.text_splitter import RecursiveCharacterTextSplitter  # noqa: E402
+
+from context_packer import get_encoding  # noqa: E402
+from fast_splitter import FastTokenSplitter  # noqa: E402
+from settings import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS  # noqa: E402
+
+VOCABULARY = (
+    "the employee handbook describes onboarding steps benefits leave policy payroll manager "
+    "review quarterly security training laptop access badge office remote expenses travel "
+    "approval form deadline contact team department schedule holiday insurance pension"
+).split()
+
+
+# Function to build a corpus of pages that look like extracted PDF text
+def synthetic_pages(pages: int, seed: int = 0) -> List[Document]:
+    rng = random.Random(seed)
+    documents = []
+    for page in range(pages):
+        paragraphs = []
+        for _ in range(rng.randint(3, 8)):
+            # PDF extraction leaves hard line breaks every few words
+            words = [rng.choice(VOCABULARY) for _ in range(rng.randint(30, 160))]
+            lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+            paragraphs.append("\n".join(lines) + ".")
+        documents.append(Document(page_content="\n\n".join(paragraphs), metadata={"page": page}))
+    return documents
+
+
+# Function to build the splitters being compared
+def splitters() -> Dict[str, Callable[[List[Document]], List[Document]]]:
+    chars = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True)
+    tokens = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        model_name="gpt-4o", chunk_size=CHUNK_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS, add_start_index=True,
+    )
+    fast = FastTokenSplitter(chunk_size=CHUNK_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS)
+    return {
+        "chars": chars.split_documents,
+        "tiktoken": tokens.split_documents,
+        "fast": fast.split_documents,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per splitter (median is reported)")
+    parser.add_argument("--only", choices=["chars", "tiktoken", "fast"], nargs="+", help="run only these splitters")
+    args = parser.parse_args()
+
+    documents = synthetic_pages(args.pages)
+    megabytes = sum(len(d.page_content.encode("utf-8")) for d in documents) / 1e6
+    encoding = get_encoding()
+    print(f"Corpus: {args.pages} pages, {megabytes:.1f} MB")
+
+    print(f"{'splitter':>9} {'MB/s':>8} {'chunks':>7} {'mean tok':>9} {'max tok':>8}")
+    for name, split in splitters().items():
+        if args.only and name not in args.only:
+            continue
+        seconds = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            chunks = split(documents)
+            seconds.append(time.perf_counter() - started)
+        sizes = [len(tokens) for tokens in encoding.encode_ordinary_batch([c.page_content for c in chunks])]
+        print(f"{name:>9} {megabytes / statistics.median(seconds):>8.2f} {len(chunks):>7} "
+              f"{statistics.mean(sizes):>9.0f} {max(sizes):>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
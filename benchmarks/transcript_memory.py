@@ -0,0 +1,153 @@
+"""
+Per-session transcript memory benchmark.
+
+Replays a long synthetic chat into each app's session state, once the way
+the apps used to store it and once with ``common.transcript``, and reports
+the bytes still allocated per session (tracemalloc). Each message text is
+a freshly allocated string, as it would be when it arrives from the user or
+the provider, so both layouts pay for the texts themselves.
+
+Layouts replayed:
+  langchain  per-message dicts, plus a ConversationBufferMemory holding the same turns
+  ragapp     HumanMessage/AIMessage objects in session state, plus the chain's memory
+  gptclone   one ``{"role": ..., "content": ...}`` dict per message (reference only)
+
+The target is for the apps that kept each turn two or three times
+(langchain, ragapp) to need at most half as much. GPTCloneApp only ever
+kept one copy, so its floor is the message text itself. It is reported for
+reference and is not held to the target.
+
+    python benchmarks/transcript_memory.py
+    python benchmarks/transcript_memory.py --turns 1000 --answer-words 200
+"""
+
+import argparse
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain.memory import ConversationBufferMemory  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+from common.transcript import ASSISTANT, USER, Transcript, langchain_history  # noqa: E402
+
+WORDS = (
+    "the a of to and in is it that for you on with as this be are can your document answer question "
+    "policy summary please explain more about how what why when thanks model context example"
+).split()
+SHORT_REPLIES = ["thanks", "ok", "great, thanks!", "why?", "go on"]
+
+
+# Function to make the chat: (question, answer) pairs with some repeated short questions
+def synthetic_chat(turns: int, question_words: int, answer_words: int, seed: int = 0):
+    rng = random.Random(seed)
+
+    def text(words):
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    return [
+        (rng.choice(SHORT_REPLIES) if rng.random() < 0.2 else text(question_words), text(answer_words))
+        for _ in range(turns)
+    ]
+
+
+# Function to copy a text into a new string object (as if it had just arrived)
+def fresh(text: str) -> str:
+    return "".join(list(text))
+
+
+# Old layouts: each returns the objects a session kept alive
+def old_gptclone(chat):
+    messages = []
+    for question, answer in chat:
+        messages.append({"role": "user", "content": fresh(question)})
+        messages.append({"role": "bot", "content": fresh(answer)})
+    return messages
+
+
+def old_langchain(chat):
+    chat_history, memory = [], ConversationBufferMemory(return_messages=True)
+    for question, answer in chat:
+        question, answer = fresh(question), fresh(answer)
+        chat_history.append({"role": "user", "content": question})
+        memory.save_context({"input": question}, {"response": answer})
+        chat_history.append({"role": "bot", "content": answer})
+    return chat_history, memory
+
+
+def old_ragapp(chat):
+    chat_history, memory = [], ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    for question, answer in chat:
+        question, answer = fresh(question), fresh(answer)
+        memory.save_context({"question": question}, {"answer": answer})
+        chat_history.append(HumanMessage(content=question))
+        chat_history.append(AIMessage(content=answer))
+    return chat_history, memory
+
+
+# New layouts: one transcript per session, written directly or through the chain's memory view
+def new_gptclone(chat):
+    transcript = Transcript(role_names=("user", "bot"))
+    for question, answer in chat:
+        transcript.append(USER, fresh(question))
+        transcript.append(ASSISTANT, fresh(answer))
+    return transcript
+
+
+def new_with_memory(chat, input_key, output_key):
+    transcript = Transcript()
+    memory = ConversationBufferMemory(chat_memory=langchain_history(transcript), memory_key="chat_history", return_messages=True)
+    for question, answer in chat:
+        memory.save_context({input_key: fresh(question)}, {output_key: fresh(answer)})
+    return transcript, memory
+
+
+# Function to measure the bytes still allocated for what a layout returns
+def retained_bytes(layout, chat) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = layout(chat)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500, help="question/answer turns per session")
+    parser.add_argument("--question-words", type=int, default=15)
+    parser.add_argument("--answer-words", type=int, default=80)
+    args = parser.parse_args()
+
+    chat = synthetic_chat(args.turns, args.question_words, args.answer_words)
+    text_bytes = sum(len(question) + len(answer) for question, answer in chat)
+    # (name, old layout, new layout, held to the halving target)
+    layouts = [
+        ("langchain", old_langchain, lambda chat: new_with_memory(chat, "input", "response"), True),
+        ("ragapp", old_ragapp, lambda chat: new_with_memory(chat, "question", "answer"), True),
+        ("gptclone", old_gptclone, new_gptclone, False),
+    ]
+
+    # Warm-up pass so one-off allocations (imports, pydantic caches) aren't counted
+    for _, old, new, _ in layouts:
+        old(chat[:2])
+        new(chat[:2])
+
+    print(f"{args.turns} turns, {text_bytes / 1024:.0f} KiB of message text")
+    print(f"{'app':>10} {'before KiB':>11} {'after KiB':>10} {'ratio':>7}  target")
+    failed = False
+    for name, old, new, targeted in layouts:
+        old_bytes, new_bytes = retained_bytes(old, chat), retained_bytes(new, chat)
+        ratio = new_bytes / old_bytes
+        failed |= targeted and ratio > 0.5
+        status = ("ok" if ratio <= 0.5 else "FAIL") if targeted else "n/a (single copy before)"
+        print(f"{name:>10} {old_bytes / 1024:>11.0f} {new_bytes / 1024:>10.0f} {ratio:>7.0%}  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Opt-in sampling profiler for Streamlit reruns.
+
+Call ``profile_reruns(__file__)`` near the top of an app script. When
+profiling is enabled (``STREAMLIT_PROFILE=1`` or ``?profile=1`` in the URL),
+a background thread samples the script thread's stack every few
+milliseconds until the rerun ends. Samples are attributed to top-level
+sections of the script (the comment heading above the line that was
+running) and folded into call stacks. A sidebar panel shows the previous
+rerun's breakdown, a flame summary and the wall time of recent reruns.
+
+Set ``STREAMLIT_PROFILE_DIR`` to also write each rerun's stacks to disk in
+folded format (one ``stack count`` line per stack), which flamegraph.pl and
+speedscope can read.
+"""
+
+import ast
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+SAMPLE_INTERVAL_S = 0.005
+HISTORY_SIZE = 50
+FLAME_ROWS = 15
+MAX_RERUN_S = 600
+
+COMMENT_PATTERN = re.compile(r"^\s*#\s*(.+?)\s*$")
+
+
+# Function to check whether profiling was asked for
+def profiling_enabled() -> bool:
+    if os.getenv("STREAMLIT_PROFILE", "").lower() in ("1", "true", "yes"):
+        return True
+    try:
+        return st.query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+
+# Function to map each line of a script to the comment heading of its section
+@lru_cache(maxsize=None)
+def section_labels(script_path: str) -> Tuple[str, ...]:
+    source = Path(script_path).read_text(encoding="utf-8")
+    lines = source.splitlines()
+
+    # Comments inside function and class bodies don't start a top-level section
+    nested = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            nested.update(range(node.lineno, node.end_lineno + 1))
+
+    labels = []
+    current = "(script start)"
+    for number, line in enumerate(lines, start=1):
+        match = COMMENT_PATTERN.match(line)
+        if match and number not in nested:
+            current = match.group(1)
+        labels.append(current)
+    return tuple(labels)
+
+
+class RerunProfile:
+    def __init__(self, wall_ms: float, samples: int, sections: Dict[str, int], stacks: Counter):
+        self.wall_ms = wall_ms
+        self.samples = samples
+        self.sections = sections
+        self.stacks = stacks
+
+
+class ProfileHistory:
+    """Completed rerun profiles for one session (kept in session state)."""
+
+    def __init__(self):
+        self.reruns: Deque[RerunProfile] = deque(maxlen=HISTORY_SIZE)
+        self.active: Optional["RerunSampler"] = None
+
+
+class RerunSampler(threading.Thread):
+    """
+    Samples one rerun of the script. The rerun is over once the script's
+    module frame is no longer on the script thread's stack.
+    """
+
+    def __init__(self, script_path: str, module_frame, history: ProfileHistory, dump_dir: Optional[str]):
+        super().__init__(name="rerun-profiler", daemon=True)
+        self.script_path = script_path
+        self.module_frame = module_frame
+        self.thread_id = threading.get_ident()
+        self.history = history
+        self.dump_dir = dump_dir
+        self.started = time.perf_counter()
+        self.stopped = threading.Event()
+        self.sections: Counter = Counter()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def _sample(self) -> Optional[Tuple[int, List[str]]]:
+        # Read everything off the live frames straight away; the script keeps running
+        frame = sys._current_frames().get(self.thread_id)
+        names = []
+        while frame is not None:
+            if frame is self.module_frame:
+                return frame.f_lineno, names[::-1]  # Outermost call first
+            names.append(f"{Path(frame.f_code.co_filename).stem}.{frame.f_code.co_name}")
+            frame = frame.f_back
+        return None
+
+    def _record(self, line: int, names: List[str]):
+        labels = section_labels(self.script_path)
+        section = labels[line - 1] if 0 < line <= len(labels) else "(unknown)"
+        self.sections[section] += 1
+        self.stacks[(section, *names)] += 1
+        self.samples += 1
+
+    def run(self):
+        deadline = self.started + MAX_RERUN_S
+        while not self.stopped.is_set() and time.perf_counter() < deadline:
+            sample = self._sample()
+            if sample is None:
+                break  # The rerun finished
+            self._record(*sample)
+            time.sleep(SAMPLE_INTERVAL_S)
+        self.module_frame = None
+        self.finish()
+
+    def finish(self):
+        wall_ms = (time.perf_counter() - self.started) * 1000
+        profile = RerunProfile(wall_ms, self.samples, dict(self.sections), self.stacks)
+        self.history.reruns.append(profile)
+        if self.dump_dir:
+            dump_profile(profile, self.script_path, self.dump_dir)
+
+
+# Function to write a rerun profile as folded stacks plus a JSON summary
+def dump_profile(profile: RerunProfile, script_path: str, dump_dir: str):
+    directory = Path(dump_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = f"{Path(script_path).stem}-{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}"
+    folded = "\n".join(f"{';'.join(stack)} {count}" for stack, count in profile.stacks.most_common())
+    (directory / f"{stem}.folded").write_text(folded + "\n")
+    (directory / f"{stem}.json").write_text(json.dumps({
+        "script": script_path,
+        "wall_ms": round(profile.wall_ms, 1),
+        "samples": profile.samples,
+        "sample_interval_ms": SAMPLE_INTERVAL_S * 1000,
+        "sections": profile.sections,
+        "sections_ms": {
+            section: round(profile.wall_ms * count / max(1, profile.samples), 1)
+            for section, count in profile.sections.items()
+        },
+    }, indent=2))
+
+
+# Function to show the previous rerun's profile in the sidebar
+def render_panel(history: ProfileHistory):
+    with st.sidebar.expander("⏱️ Rerun profile", expanded=False):
+        if not history.reruns:
+            st.caption("Profiling this session: the breakdown appears after the first rerun.")
+            return
+        last = history.reruns[-1]
+        st.metric("Last rerun", f"{last.wall_ms:.0f} ms", help=f"{last.samples} samples every {SAMPLE_INTERVAL_S * 1000:.0f} ms")
+        st.line_chart([profile.wall_ms for profile in history.reruns], height=120)
+
+        total = max(1, last.samples)
+        st.markdown("**Sections**")
+        st.dataframe(
+            [
+                {"section": section, "ms": round(last.wall_ms * count / total), "share": f"{count / total:.0%}"}
+                for section, count in sorted(last.sections.items(), key=lambda item: -item[1])
+            ],
+            hide_index=True,
+        )
+
+        st.markdown("**Flame summary** (hottest stacks)")
+        st.code("\n".join(
+            f"{count / total:>4.0%}  {' ▸ '.join(stack)}" for stack, count in last.stacks.most_common(FLAME_ROWS)
+        ), language=None)
+
+
+def profile_reruns(script_path: str):
+    """
+    Profile the current rerun of ``script_path`` if profiling is enabled.
+    Call it from the app script itself, at module level.
+    """
+    if not profiling_enabled():
+        return
+    history = st.session_state.setdefault("_rerun_profiler", ProfileHistory())
+
+    # A rerun can start before the previous sampler noticed its run ended
+    if history.active is not None and history.active.is_alive():
+        history.active.stopped.set()
+        history.active.join()
+
+    render_panel(history)
+    module_frame = sys._getframe(1)
+    history.active = RerunSampler(str(Path(script_path).resolve()), module_frame, history,
+                                  os.getenv("STREAMLIT_PROFILE_DIR"))
+    history.active.start()
@@ -0,0 +1,170 @@
+"""
+Prefix-stable prompt layout and prompt-cache accounting.
+
+Providers cache the longest prompt prefix they have seen recently and bill
+(and serve) those tokens more cheaply, but only up to the first token that
+differs. ``PromptLayout`` therefore assembles prompts from the most stable
+sections to the most volatile ones: fixed instructions, then the
+append-only conversation history, then per-query retrieval context and the
+question. Sections keep the order they were added in within a tier.
+
+``PromptCacheStats`` records prompt and cached token counts from the
+provider's usage fields (OpenAI ``prompt_tokens_details.cached_tokens``,
+Gemini ``cached_content_token_count``, LangChain ``input_token_details``),
+together with latency, so the hit rate and the latency difference between
+cached and uncached calls can be shown.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Tiers, most stable first
+STABLE, HISTORY, VOLATILE = 0, 1, 2
+
+
+class PromptLayout:
+    """Prompt sections grouped by how often they change, rendered stable-first."""
+
+    def __init__(self, separator: str = "\n\n"):
+        self.separator = separator
+        self.sections: List[Tuple[int, str]] = []
+
+    def add(self, tier: int, text: str, heading: Optional[str] = None) -> "PromptLayout":
+        text = text.strip()
+        if heading:
+            text = f"{heading}:\n{text}" if "\n" in text else f"{heading}: {text}"
+        self.sections.append((tier, text))
+        return self
+
+    def stable(self, text: str, heading: Optional[str] = None) -> "PromptLayout":
+        return self.add(STABLE, text, heading)
+
+    def history(self, text: str, heading: Optional[str] = None) -> "PromptLayout":
+        return self.add(HISTORY, text, heading)
+
+    def volatile(self, text: str, heading: Optional[str] = None) -> "PromptLayout":
+        return self.add(VOLATILE, text, heading)
+
+    def parts(self, tier: int) -> List[str]:
+        return [text for section_tier, text in self.sections if section_tier == tier]
+
+    # Function to render the sections of some tiers (all of them by default), stable-first
+    def render(self, tiers: Tuple[int, ...] = (STABLE, HISTORY, VOLATILE)) -> str:
+        return self.separator.join(text for tier in sorted(tiers) for text in self.parts(tier) if text)
+
+    # Function to render as chat messages: stable text as the system message, the rest as one user message
+    def messages(self) -> List[Dict[str, str]]:
+        messages = []
+        system = self.render((STABLE,))
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": self.render((HISTORY, VOLATILE))})
+        return messages
+
+
+# Function to read (prompt tokens, cached prompt tokens) out of a provider usage record
+def cache_usage(usage: Any) -> Optional[Tuple[int, int]]:
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else lambda key, default=None: getattr(usage, key, default)
+
+    # LangChain usage_metadata
+    if get("input_tokens") is not None:
+        details = get("input_token_details") or {}
+        return get("input_tokens"), (details.get("cache_read") or 0)
+    # OpenAI chat completions usage
+    if get("prompt_tokens") is not None:
+        details = get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+        return get("prompt_tokens"), (cached or 0)
+    # Gemini usage_metadata
+    if get("prompt_token_count") is not None:
+        return get("prompt_token_count"), (get("cached_content_token_count") or 0)
+    return None
+
+
+class CacheRecord:
+    def __init__(self, prompt_tokens: int, cached_tokens: int, latency_s: float):
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
+        self.latency_s = latency_s
+
+
+class PromptCacheStats:
+    """Running prompt-cache counters (thread-safe, so one can be shared by sessions)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.hit_latency_s: List[float] = []
+        self.miss_latency_s: List[float] = []
+        self.last: Optional[CacheRecord] = None
+
+    def record(self, usage: Any, latency_s: float) -> Optional[CacheRecord]:
+        counts = cache_usage(usage)
+        if counts is None:
+            return None
+        record = CacheRecord(counts[0], counts[1], latency_s)
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += record.prompt_tokens
+            self.cached_tokens += record.cached_tokens
+            (self.hit_latency_s if record.cached_tokens else self.miss_latency_s).append(latency_s)
+            self.last = record
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            hits, misses = list(self.hit_latency_s), list(self.miss_latency_s)
+            return {
+                "requests": self.requests,
+                "cached_requests": len(hits),
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "token_hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+                "hit_latency_s": sum(hits) / len(hits) if hits else None,
+                "miss_latency_s": sum(misses) / len(misses) if misses else None,
+            }
+
+    # Function to summarise the counters in one line for a caption
+    def describe(self) -> str:
+        stats = self.stats()
+        text = (f"Prompt cache: {stats['token_hit_rate']:.0%} of prompt tokens cached "
+                f"({stats['cached_requests']}/{stats['requests']} calls)")
+        if stats["hit_latency_s"] is not None and stats["miss_latency_s"] is not None:
+            text += f", {stats['hit_latency_s']:.2f}s with cache vs. {stats['miss_latency_s']:.2f}s without"
+        return text
+
+
+# Function to build a LangChain callback handler that feeds LLM usage into a PromptCacheStats
+def langchain_cache_callback(stats: PromptCacheStats):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class PromptCacheCallback(BaseCallbackHandler):
+        def __init__(self):
+            self.started: Dict[Any, float] = {}
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self.started[run_id] = time.perf_counter()
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self.started[run_id] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            latency_s = time.perf_counter() - self.started.pop(run_id, time.perf_counter())
+            usage = None
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, "message", None)
+                    usage = getattr(message, "usage_metadata", None) or usage
+            if usage is None and response.llm_output:
+                usage = response.llm_output.get("token_usage") or response.llm_output.get("usage_metadata")
+            stats.record(usage, latency_s)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self.started.pop(run_id, None)
+
+    return PromptCacheCallback()
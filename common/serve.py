@@ -0,0 +1,48 @@
+"""
+Start a Streamlit app with its warm-up run at worker boot.
+
+The warm-up (see ``common/warmup.py``) runs in this process before the
+server starts accepting sessions, so the caches, imports and connections it
+fills are the ones the app's reruns use.
+
+    python -m common.serve Week_2/RAGApp/ragapp.py --server.port 8501
+    python -m common.serve Week_2/RAGApp/ragapp.py --no-wait   # serve while warming up
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from common.warmup import start_warmup
+
+DEFAULT_BOOT_TIMEOUT_S = 300
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("script", help="the app's Streamlit script")
+    parser.add_argument("--config", help="warm-up config file (default: warmup.json at the repo root)")
+    parser.add_argument("--no-wait", action="store_true", help="start serving without waiting for the warm-up")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_BOOT_TIMEOUT_S, help="longest to wait for the warm-up (seconds)")
+    args, streamlit_args = parser.parse_known_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Streamlit puts the script's folder on sys.path too; the warm-up needs it for the app's helper modules
+    script = Path(args.script).resolve()
+    sys.path.insert(0, str(script.parent))
+
+    warmup = start_warmup(str(script), args.config)
+    if not args.no_wait and not warmup.done.wait(args.timeout):
+        logging.warning("Warm-up still running after %.0fs; serving anyway", args.timeout)
+    for step in warmup.errors():
+        logging.warning("Warm-up step failed: %s (%s)", step.name, step.error)
+
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", str(script), *streamlit_args]
+    return stcli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Compact per-session chat transcripts.
+
+Each session keeps its conversation in one ``Transcript``: role codes in a
+byte array and the message texts in a single list (short texts, such as
+"thanks" or "ok", are interned so repeats share one string). Nothing else
+keeps its own copy. The UI iterates over the transcript, and LangChain
+memory reads and writes it through ``langchain_history()``, which builds
+message objects only while a chain is running.
+"""
+
+import sys
+from array import array
+from typing import Iterator, List, Sequence, Tuple
+
+# Role codes stored per message
+USER, ASSISTANT = 0, 1
+
+# Texts up to this long are interned (repeated short replies share one string)
+INTERN_MAX_CHARS = 64
+
+
+class Transcript:
+    """Append-only list of (role, text) messages; ``role_names`` label the roles for display."""
+
+    __slots__ = ("role_names", "_roles", "_texts")
+
+    def __init__(self, role_names: Sequence[str] = ("user", "assistant")):
+        self.role_names = tuple(role_names)
+        self._roles = array("B")
+        self._texts: List[str] = []
+
+    def append(self, role: int, text: str):
+        if role not in (USER, ASSISTANT):
+            raise ValueError(f"Unknown role code {role!r}")
+        self._roles.append(role)
+        self._texts.append(sys.intern(text) if len(text) <= INTERN_MAX_CHARS else text)
+
+    def clear(self):
+        del self._roles[:]
+        self._texts.clear()
+
+    def role(self, i: int) -> int:
+        return self._roles[i]
+
+    def text(self, i: int) -> str:
+        return self._texts[i]
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __getitem__(self, i: int) -> Tuple[str, str]:
+        return self.role_names[self._roles[i]], self._texts[i]
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        names = self.role_names
+        for role, text in zip(self._roles, self._texts):
+            yield names[role], text
+
+    # Session state holds the transcript by reference, so copies share it
+    def __deepcopy__(self, memo):
+        return self
+
+
+# Function to expose a transcript as LangChain chat message history (pass it to a memory as chat_memory)
+def langchain_history(transcript: Transcript):
+    from langchain_core.chat_history import BaseChatMessageHistory
+    from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+    class TranscriptHistory(BaseChatMessageHistory):
+        def __init__(self):
+            self.transcript = transcript
+
+        # Message objects are built per call and dropped once the chain has formatted its prompt
+        @property
+        def messages(self) -> List[BaseMessage]:
+            return [
+                HumanMessage(content=self.transcript.text(i)) if self.transcript.role(i) == USER
+                else AIMessage(content=self.transcript.text(i))
+                for i in range(len(self.transcript))
+            ]
+
+        def add_message(self, message: BaseMessage):
+            if message.type not in ("human", "ai"):
+                raise ValueError(f"Transcripts only hold human and AI messages, not {message.type!r}")
+            self.transcript.append(USER if message.type == "human" else ASSISTANT, message.content)
+
+        def clear(self):
+            self.transcript.clear()
+
+        def __deepcopy__(self, memo):
+            return self
+
+    return TranscriptHistory()
@@ -0,0 +1,181 @@
+"""
+Worker warm-up for the Streamlit apps.
+
+After a deploy or a worker recycle the first sessions would otherwise pay
+every cold cost: importing LangChain and friends, TLS handshakes to the
+providers, listing models and loading indexes. ``start_warmup(script)``
+runs the steps configured for an app in ``warmup.json`` (or the file named
+by ``APP_WARMUP_CONFIG``) once per process, in a background thread:
+
+- ``imports``: modules to import ahead of the first rerun
+- ``openai_connections`` / ``http_connections``: URLs to open keep-alive
+  connections to, through the shared clients the apps send requests with
+  (``openai_http_client()`` for the OpenAI SDK, ``http_session()`` for
+  plain ``requests`` calls)
+- ``preload``: ``"module:function"`` calls (or ``{"call", "args", "kwargs"}``
+  objects) that fill process-wide caches
+- ``keep_warm_s``: how often to touch the connections again so they stay open
+
+Any list entry can also be an object with ``"if_env"``: the names of
+environment variables (API keys) of which at least one must be set for the
+entry to run, so a worker only warms the providers its deployment uses.
+``imports`` entries then name their module as ``"module"``, connection
+entries their URL as ``"url"``.
+
+Launch the app with ``python -m common.serve <script>`` to run the warm-up
+at worker boot, before the server accepts sessions. Apps also call
+``start_warmup(__file__)`` themselves, so a plain ``streamlit run`` still
+warms up in the background on the first rerun.
+"""
+
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CONFIG = REPO_ROOT / "warmup.json"
+
+# Idle keep-alive connections are kept this long (httpx closes them after 5 s by default)
+KEEPALIVE_S = 300
+CONNECT_TIMEOUT_S = 5
+
+
+# Function to get the process-wide HTTP client handed to OpenAI SDK clients
+@lru_cache(maxsize=None)
+def openai_http_client():
+    import httpx
+    from openai import DefaultHttpxClient
+
+    return DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=KEEPALIVE_S),
+    )
+
+
+# Function to get the process-wide requests session for plain HTTP APIs (Hugging Face)
+@lru_cache(maxsize=None)
+def http_session():
+    import requests
+
+    return requests.Session()
+
+
+# Function to check an entry's "if_env" condition (plain strings always apply)
+def enabled(entry) -> bool:
+    if not isinstance(entry, dict) or "if_env" not in entry:
+        return True
+    return any(os.getenv(name) for name in entry["if_env"])
+
+
+# Function to list the entries of a warm-up setting that apply to this deployment
+def entries(config: Dict[str, Any], key: str, field: str) -> List[Any]:
+    return [entry[field] if isinstance(entry, dict) and field in entry else entry
+            for entry in config.get(key, []) if enabled(entry)]
+
+
+class WarmupStep:
+    def __init__(self, name: str, seconds: float, error: Optional[str] = None):
+        self.name = name
+        self.seconds = seconds
+        self.error = error
+
+
+class Warmup:
+    """The warm-up of one app in this process."""
+
+    def __init__(self, app: str, config: Dict[str, Any]):
+        self.app = app
+        self.config = config
+        self.steps: List[WarmupStep] = []
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"warmup-{Path(app).stem}", daemon=True)
+
+    def _step(self, name: str, action, *args, **kwargs):
+        started = time.perf_counter()
+        error = None
+        try:
+            action(*args, **kwargs)
+        except Exception as e:  # A failed step must not take the worker down
+            error = f"{type(e).__name__}: {e}"
+            logger.warning("Warm-up step %s failed: %s", name, error)
+        self.steps.append(WarmupStep(name, time.perf_counter() - started, error))
+
+    def _touch_connections(self):
+        for url in entries(self.config, "openai_connections", "url"):
+            self._step(f"connect {url}", openai_http_client().head, url, timeout=CONNECT_TIMEOUT_S)
+        for url in entries(self.config, "http_connections", "url"):
+            self._step(f"connect {url}", http_session().head, url, timeout=CONNECT_TIMEOUT_S)
+
+    def _run(self):
+        try:
+            for module in entries(self.config, "imports", "module"):
+                self._step(f"import {module}", importlib.import_module, module)
+            self._touch_connections()
+            for entry in self.config.get("preload", []):
+                if not enabled(entry):
+                    continue
+                if isinstance(entry, str):
+                    entry = {"call": entry}
+                module, function = entry["call"].split(":")
+                self._step(
+                    f"preload {entry['call']}",
+                    lambda: getattr(importlib.import_module(module), function)(*entry.get("args", []), **entry.get("kwargs", {})),
+                )
+        finally:
+            self.done.set()
+        logger.info("Warm-up of %s finished in %.2fs", self.app, self.seconds())
+
+        # Touch the connections now and then so the first request after a quiet spell finds them open
+        interval = self.config.get("keep_warm_s")
+        while interval:
+            time.sleep(interval)
+            self.steps = self.steps[-100:]
+            self._touch_connections()
+
+    def seconds(self) -> float:
+        return sum(step.seconds for step in self.steps)
+
+    def errors(self) -> List[WarmupStep]:
+        return [step for step in self.steps if step.error]
+
+
+_warmups: Dict[str, Warmup] = {}
+_lock = threading.Lock()
+
+
+# Function to read an app's warm-up settings (keyed by the script's path from the repo root)
+def load_config(app: str, config_path: Optional[str] = None) -> Dict[str, Any]:
+    path = Path(config_path or os.getenv("APP_WARMUP_CONFIG") or DEFAULT_CONFIG)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get(app, {})
+
+
+# Function to name an app by its script's path relative to the repo root
+def app_name(script_path: str) -> str:
+    script = Path(script_path).resolve()
+    try:
+        return script.relative_to(REPO_ROOT).as_posix()
+    except ValueError:
+        return script.name
+
+
+def start_warmup(script_path: str, config_path: Optional[str] = None) -> Warmup:
+    """
+    Start warming up the app in ``script_path`` (once per process) and
+    return its ``Warmup``; ``warmup.done`` is set when the steps finished.
+    """
+    app = app_name(script_path)
+    with _lock:
+        warmup = _warmups.get(app)
+        if warmup is None:
+            warmup = _warmups[app] = Warmup(app, load_config(app, config_path))
+            warmup.thread.start()
+    return warmup
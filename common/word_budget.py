@@ -0,0 +1,101 @@
+"""
+Client-side word budgets for generated text.
+
+The apps ask for "<N words" in the prompt, but models often run long. A
+``WordBudget`` counts words as chunks stream in. Once the text passes the
+soft limit (the budget minus some slack), it stops at the first sentence
+boundary. It never lets the text run past the hard limit. The caller stops
+reading, and the upstream stream is closed, so no more tokens are waited on
+or paid for. ``max_tokens_for()`` turns the budget into a ``max_tokens`` /
+``max_output_tokens`` setting so the provider enforces a ceiling too.
+"""
+
+import math
+import re
+from typing import Iterable, Iterator, Optional
+
+WORD_PATTERN = re.compile(r"\S+")
+# A sentence ends at . ! ? (optionally followed by closing quotes/brackets) and whitespace
+SENTENCE_END_PATTERN = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)")
+
+TOKENS_PER_WORD = 1.4
+TOKEN_MARGIN = 16
+DEFAULT_SLACK = 0.15
+
+
+# Function to size a max_tokens setting for a word budget
+def max_tokens_for(max_words: int) -> int:
+    return math.ceil(max_words * TOKENS_PER_WORD) + TOKEN_MARGIN
+
+
+# Function to find where text should be cut to respect the budget (None: keep going)
+def find_cut(text: str, max_words: int, slack: float = DEFAULT_SLACK, final: bool = False) -> Optional[int]:
+    words = list(WORD_PATTERN.finditer(text))
+    soft_words = max(1, math.floor(max_words * (1 - slack)))
+    if len(words) < soft_words:
+        return None
+
+    # First sentence end after the soft limit, but not past the hard one
+    soft_end = words[soft_words - 1].end()
+    hard_end = words[max_words - 1].end() if len(words) >= max_words else len(text)
+    boundary = SENTENCE_END_PATTERN.search(text + (" " if final else ""), soft_end - 1)
+    if boundary is not None and boundary.end() <= hard_end:
+        return boundary.end()
+    if len(words) > max_words or (final and len(words) == max_words):
+        return hard_end  # No sentence ended in time: stop at the hard limit
+    return None
+
+
+class WordBudget:
+    """
+    Accepts streamed text chunks until the word budget is used up. ``feed()``
+    returns the part of each chunk that is kept; once ``stopped`` is set,
+    the rest of the stream should be abandoned.
+    """
+
+    def __init__(self, max_words: int, slack: float = DEFAULT_SLACK):
+        self.max_words = max_words
+        self.slack = slack
+        self.text = ""
+        self.stopped = False
+
+    def feed(self, chunk: str) -> str:
+        if self.stopped:
+            return ""
+        emitted = len(self.text)
+        self.text += chunk
+        cut = find_cut(self.text, self.max_words, self.slack)
+        if cut is not None:
+            self.text = self.text[:max(cut, emitted)].rstrip()
+            self.stopped = True
+        return self.text[emitted:]
+
+
+# Function to pass a text stream through a word budget, closing the upstream once it is spent
+def enforce_word_budget(chunks: Iterable[str], max_words: int, slack: float = DEFAULT_SLACK) -> Iterator[str]:
+    budget = WordBudget(max_words, slack)
+    try:
+        for chunk in chunks:
+            kept = budget.feed(chunk)
+            if kept:
+                yield kept
+            if budget.stopped:
+                break
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+# Function to trim finished (non-streamed) text to the same budget
+def trim_to_word_budget(text: str, max_words: int, slack: float = DEFAULT_SLACK) -> str:
+    cut = find_cut(text, max_words, slack, final=True)
+    return text if cut is None else text[:cut].rstrip()
+
+
+# Function to cut finished text back to the last full sentence within the budget (None: no sentence ends in it)
+def trim_to_last_sentence(text: str, max_words: int) -> Optional[str]:
+    words = list(WORD_PATTERN.finditer(text))
+    hard_end = words[max_words - 1].end() if len(words) >= max_words else len(text)
+    ends = [match.end() for match in SENTENCE_END_PATTERN.finditer(text + " ") if match.end() <= hard_end]
+    return text[:ends[-1]] if ends else None